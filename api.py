@@ -1,73 +1,303 @@
-# REST API: teams, swimmers, events, results, and POST /api/import for SwimCloud.
+# REST API: teams, swimmers, events, results, rankings, relays, exports, and POST /api/import for SwimCloud.
 
+import base64
+import hashlib
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 
-from flask import Blueprint, jsonify, request
+from flask import (
+    Blueprint, Response, current_app, jsonify, make_response, request,
+    stream_with_context, url_for,
+)
+from sqlalchemy import and_, func, or_, select
+from werkzeug.datastructures import MultiDict
 from flask_login import login_required, current_user
 
-from extensions import db, cache
+from extensions import db, cache, login_manager
 from models import Team, Swimmer, Event, Time, user_team_seasons
 import swimcloud_scraper as sc
 
-from services.scoring import format_time
+from services.scoring import (
+    RELAYS, format_time, query_individual_event, rank_individual_event,
+    build_all_pools, build_relay_view,
+)
 from services.import_service import import_team
+from services.export_service import export_request
+from services.export_cache import export_cache, export_meta, get_or_build, job_status, send_export
+from services.snapshot import load_snapshot, load_snapshots
+from services.event_registry import registry
+from services.access import can_access, team_season_pairs, team_season_label
+from services import data_version, solver_stats, tokens
+from services.db_routing import read_only
 
 log = logging.getLogger(__name__)
 
+_EXPORT_KEY = re.compile(r"[0-9a-f]{64}")
+
 api_bp = Blueprint("api", __name__)
 
 
+class ApiError(Exception):
+    """Client error surfaced as {"error": message} with the given status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_bp.errorhandler(ApiError)
+def _api_error(e):
+    return jsonify(error=e.message), e.status
+
+
+@login_manager.request_loader
+def load_token_user(req):
+    """Authorization: Bearer <token> for /api/* only; the UI stays session-based."""
+    if req.blueprint != "api":
+        return None
+    scheme, _, raw = req.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    principal = tokens.verify(raw.strip())
+    if principal is None:
+        raise ApiError("Invalid or revoked API token", 401)
+    return principal
+
+
+def require_scope(scope):
+    """403 unless the caller is a session login or holds a token with this scope."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            scopes = getattr(current_user, "scopes", None)
+            if scopes is not None and scope not in scopes:
+                raise ApiError(f"API token lacks the '{scope}' scope", 403)
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def conditional(view):
+    """Strong ETag + If-None-Match for GET views that depend only on stored data.
+
+    The tag hashes the user, URL, Accept header and the data versions of the
+    user's team-seasons, of their whole teams (rosters span seasons the user
+    may not hold) and of the event list, so an unchanged poll gets a 304
+    without running the view.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        pairs = team_season_pairs(current_user.id)
+        scopes = [data_version.EVENTS] + [
+            data_version.ts_scope(tid, yr) for tid, _, yr in pairs
+        ] + [data_version.team_scope(tid) for tid in dict.fromkeys(tid for tid, _, _ in pairs)]
+        versions = data_version.versions(scopes)
+        basis = "|".join([
+            str(current_user.id), request.full_path, str(request.accept_mimetypes),
+            *(f"{s}={versions[s]}" for s in scopes),
+        ])
+        etag = hashlib.sha256(basis.encode()).hexdigest()[:32]
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.vary.update(("Accept", "Cookie", "Authorization"))
+        return response
+    return wrapped
+
+
+def _int(data, key, default, minimum=None):
+    try:
+        value = int(data.get(key, default))
+    except (ValueError, TypeError):
+        raise ApiError(f"{key} must be an integer")
+    if minimum is not None and value < minimum:
+        raise ApiError(f"{key} must be at least {minimum}")
+    return value
+
+
+def _choice(data, key, choices, default):
+    value = data.get(key, default)
+    if value not in choices:
+        raise ApiError(f"{key} must be one of: {', '.join(choices)}")
+    return value
+
+
+def _json_body():
+    """The request's JSON object ({} when absent); 400 for any other JSON value."""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ApiError("Request body must be a JSON object")
+    return data
+
+
+def _str_list(data, key, default):
+    """data[key] as a list of strings; a comma-separated string is split."""
+    value = data.get(key) or default
+    if isinstance(value, str):
+        value = [v for v in value.split(",") if v]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ApiError(f"{key} must be a list of strings")
+    return value
+
+
+def _selection(data, pairs):
+    """Validate team_seasons/gender/excluded against the user's (tid, tname, yr) pairs.
+
+    Returns (selected pairs, gender, excluded time-id set).
+    """
+    requested = data.get("team_seasons") or []
+    if isinstance(requested, str):
+        requested = requested.split(",")
+    if not requested:
+        raise ApiError("team_seasons is required")
+    if not isinstance(requested, list) or not all(isinstance(ts, str) for ts in requested):
+        raise ApiError('team_seasons must be a list of "tid:yr" strings')
+    allowed = {f"{tid}:{yr}": (tid, tname, yr) for tid, tname, yr in pairs}
+    missing = [ts for ts in requested if ts not in allowed]
+    if missing:
+        raise ApiError(f"Team-season not found: {', '.join(missing)}", 404)
+
+    excluded = data.get("excluded") or []
+    if isinstance(excluded, str):
+        excluded = [x for x in excluded.split(",") if x]
+    try:
+        excluded = {int(x) for x in excluded}
+    except (ValueError, TypeError):
+        raise ApiError("excluded must be a list of time ids")
+
+    gender = _choice(data, "gender", ("M", "F"), "M")
+    return [allowed[ts] for ts in requested], gender, excluded
+
+
+def _rows(rows, fmt):
+    """Display rows as-is, or columnar: one parallel array per field."""
+    if fmt == "columnar":
+        return {key: [r[key] for r in rows] for key in (rows[0] if rows else ())}
+    return rows
+
+
+def _event_name(event_id):
+    ev_name = registry().name_for(event_id)
+    if ev_name is None:
+        raise ApiError("Event not found", 404)
+    return ev_name
+
+
+def rankings_payload(data, pairs, event_id, snapshots=None, ev_name=None):
+    """Top-N swimmers for one event over the selected team-seasons.
+
+    Ranks in SQL, or from snapshots ({'tid:yr': snapshot}) when given; with
+    snapshots and ev_name both passed in it touches no database.
+    """
+    selected, gender, excluded = _selection(data, pairs)
+    top_n = _int(data, "top_n", 16, minimum=1)
+    fmt = _choice(data, "format", ("rows", "columnar"), "rows")
+    if ev_name is None:
+        ev_name = _event_name(event_id)
+
+    if snapshots is None:
+        swimmers = query_individual_event(
+            [(tid, yr) for tid, _, yr in selected], excluded, event_id, gender, top_n,
+        )
+    else:
+        swimmers = rank_individual_event(
+            {f"{tid}:{yr}": snapshots[f"{tid}:{yr}"] for tid, _, yr in selected},
+            ev_name, excluded, top_n,
+        )
+    return {
+        "event": {"id": event_id, "name": ev_name, "course": "Y"},
+        "gender": gender,
+        "format": fmt,
+        "swimmers": _rows(swimmers, fmt),
+    }
+
+
+def relays_payload(data, pairs, snapshots=None):
+    """Relay squads for one relay, as the dashboard computes them.
+
+    snapshots ({'tid:yr': snapshot}) may be passed in to share one load
+    across several relays.
+    """
+    selected, gender, excluded = _selection(data, pairs)
+    relay = _choice(data, "relay", tuple(RELAYS), None)
+    scoring = _choice(data, "scoring_mode", ("unscored", "scored"), "unscored")
+    relay_sort = _choice(data, "relay_sort", ("speed", "points"), "speed")
+    fmt = _choice(data, "format", ("rows", "columnar"), "rows")
+    top_n = _int(data, "top_n", 16, minimum=1)
+    max_rpt = _int(data, "max_relays", 0, minimum=0) or 999
+    page = _int(data, "page", 1, minimum=1)
+    page_size = _int(data, "page_size", top_n, minimum=1)
+
+    keys = [f"{tid}:{yr}" for tid, _, yr in selected]
+    if snapshots is None:
+        snapshots = load_snapshots(selected, keys, gender)
+    snapshots = {k: snapshots[k] for k in keys}
+    choices_map = {f"{tid}:{yr}": team_season_label(tname, yr) for tid, tname, yr in selected}
+    legs, pagination, max_possible = build_relay_view(
+        build_all_pools(snapshots, relay, excluded), relay, scoring, max_rpt,
+        relay_sort, choices_map, top_n, page, page_size,
+    )
+    return {
+        "relay": relay,
+        "gender": gender,
+        "scoring_mode": scoring,
+        "max_possible": max_possible,
+        "pagination": pagination,
+        "format": fmt,
+        "legs": _rows(legs, fmt),
+    }
+
+
 @api_bp.route("/teams")
 @login_required
+@conditional
 def list_teams():
-    """Teams the current user has access to, plus swimmer count."""
-    teams = (
-        db.session.query(Team)
-        .join(user_team_seasons, Team.id == user_team_seasons.c.team_id)
-        .filter(user_team_seasons.c.user_id == current_user.id)
-        .distinct()
-        .order_by(Team.name)
-        .all()
-    )
+    """Teams the current user has access to, plus swimmer count (one aggregate query)."""
+    names = {tid: tname for tid, tname, _ in team_season_pairs(current_user.id)}
+    counts = dict(db.session.execute(
+        select(Swimmer.team_id, func.count(Swimmer.id))
+        .where(Swimmer.team_id.in_(names))
+        .group_by(Swimmer.team_id)
+    ).all()) if names else {}
     return jsonify([
-        {
-            "id": t.id,
-            "name": t.name,
-            "swimmer_count": len(t.swimmers),
-        }
-        for t in teams
+        {"id": tid, "name": name, "swimmer_count": counts.get(tid, 0)}
+        for tid, name in sorted(names.items(), key=lambda item: item[1])
     ])
 
 
 @api_bp.route("/teams/<int:team_id>/swimmers")
 @login_required
+@conditional
 def team_swimmers(team_id):
     """Swimmers for one team; optional ?gender=M or F. Scoped to current user."""
-    has_access = db.session.execute(
-        user_team_seasons.select().where(
-            (user_team_seasons.c.user_id == current_user.id) &
-            (user_team_seasons.c.team_id == team_id)
-        )
-    ).first()
-    if not has_access:
+    if not can_access(current_user.id, team_id):
         return jsonify(error="Team not found"), 404
 
-    team = Team.query.get_or_404(team_id)
+    q = select(Swimmer.id, Swimmer.name, Swimmer.gender).where(Swimmer.team_id == team_id)
     gender = request.args.get("gender")
-
-    q = Swimmer.query.filter_by(team_id=team.id)
     if gender:
-        q = q.filter_by(gender=gender)
-    swimmers = q.order_by(Swimmer.name).all()
+        q = q.where(Swimmer.gender == gender)
+    swimmers = db.session.execute(q.order_by(Swimmer.name)).all()
 
     return jsonify([
-        {"id": s.id, "name": s.name, "gender": s.gender}
-        for s in swimmers
+        {"id": sid, "name": name, "gender": g}
+        for sid, name, g in swimmers
     ])
 
 
 @api_bp.route("/events")
 @login_required
+@conditional
 @cache.cached(timeout=300)
 def list_events():
     """All events (name + course)."""
@@ -78,18 +308,65 @@ def list_events():
     ])
 
 
-@api_bp.route("/results")
+@api_bp.route("/events/<int:event_id>/rankings")
 @login_required
-def query_results():
-    """Times with optional filters: team_id, event_id, season, gender, limit (max 200)."""
-    team_id  = request.args.get("team_id", type=int)
-    event_id = request.args.get("event_id", type=int)
-    season   = request.args.get("season", type=int)
-    gender   = request.args.get("gender")
-    limit    = min(request.args.get("limit", 50, type=int), 200)
+@conditional
+def event_rankings(event_id):
+    """Top-N swimmers for an event. Query: team_seasons=tid:yr,..., gender, top_n, excluded, format."""
+    payload = rankings_payload(request.args, team_season_pairs(current_user.id), event_id)
+    return jsonify(payload)
+
+
+@api_bp.route("/relays", methods=["POST"])
+@login_required
+def relays():
+    """Optimized relay squads. Body: {"team_seasons": ["tid:yr"], "relay": "relay_medley", ...}."""
+    return jsonify(relays_payload(_json_body(), team_season_pairs(current_user.id)))
+
+
+NDJSON = "application/x-ndjson"
+_STREAM_BATCH = 1000
+
+
+def _encode_cursor(time_cs, time_id):
+    return base64.urlsafe_b64encode(f"{time_cs}:{time_id}".encode()).decode()
+
+
+def _decode_cursor(cursor):
+    if not isinstance(cursor, str):
+        raise ApiError("Invalid cursor")
+    try:
+        time_cs, time_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return int(time_cs), int(time_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError("Invalid cursor")
+
+
+def _result_row(row):
+    return {
+        "swimmer": row.swimmer,
+        "team": row.team,
+        "event": row.event,
+        "time_secs": row.time_cs / 100,
+        "time_formatted": format_time(row.time_cs / 100),
+        "season": row.season_year,
+    }
+
+
+def _results_query(args):
+    """Current user's times filtered by args, keyset-ordered on (time_cs, id)."""
+    team_id  = args.get("team_id", type=int)
+    event_id = args.get("event_id", type=int)
+    season   = args.get("season", type=int)
+    gender   = args.get("gender")
+    cursor   = args.get("cursor")
 
     q = (
-        db.session.query(Time, Swimmer.name, Team.name, Event.name)
+        db.session.query(
+            Time.id, Time.time_cs, Time.season_year,
+            Swimmer.name.label("swimmer"), Team.name.label("team"),
+            Event.name.label("event"),
+        )
         .join(Time.swimmer)
         .join(Swimmer.team)
         .join(Time.event)
@@ -109,24 +386,207 @@ def query_results():
         q = q.filter(Time.season_year == season)
     if gender:
         q = q.filter(Swimmer.gender == gender)
+    if cursor:
+        after_cs, after_id = _decode_cursor(cursor)
+        q = q.filter(or_(
+            Time.time_cs > after_cs,
+            and_(Time.time_cs == after_cs, Time.id > after_id),
+        ))
+    return q.order_by(Time.time_cs, Time.id)
 
-    rows = q.order_by(Time.time_secs).limit(limit).all()
 
-    return jsonify([
-        {
-            "swimmer": swimmer_name,
-            "team": team_name,
-            "event": event_name,
-            "time_secs": float(t.time_secs),
-            "time_formatted": format_time(t.time_secs),
-            "season": t.season_year,
-        }
-        for t, swimmer_name, team_name, event_name in rows
-    ])
+@read_only()
+def results_page(args):
+    """One keyset page: (result rows, next cursor or None). limit 1-200."""
+    limit = args.get("limit", 50, type=int)
+    if limit < 1:
+        raise ApiError("limit must be at least 1")
+    limit = min(limit, 200)
+    rows = _results_query(args).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(last.time_cs, last.id)
+    return [_result_row(row) for row in rows[:limit]], next_cursor
+
+
+@api_bp.route("/results")
+@login_required
+@conditional
+def query_results():
+    """Times with optional filters: team_id, event_id, season, gender, limit (max 200), cursor.
+
+    Pages are keyset-ordered on (time_cs, id); when more rows exist the
+    X-Next-Cursor header (and a rel="next" Link) carries the next cursor.
+    With Accept: application/x-ndjson every matching row is streamed, one
+    JSON object per line, and limit is optional and uncapped.
+    """
+    if request.accept_mimetypes.best == NDJSON:
+        q = _results_query(request.args)
+        limit = request.args.get("limit", type=int)
+        if limit is not None:
+            if limit < 1:
+                raise ApiError("limit must be at least 1")
+            q = q.limit(limit)
+        encode = current_app.json.dumps
+
+        def generate():
+            with read_only():
+                for row in q.yield_per(_STREAM_BATCH):
+                    yield encode(_result_row(row)) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+    rows, next_cursor = results_page(request.args)
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        args = {**request.args.to_dict(), "cursor": next_cursor}
+        response.headers["Link"] = f'<{url_for("api.query_results", **args)}>; rel="next"'
+    return response
+
+
+BATCH_TYPES = ("rankings", "relays", "results")
+BATCH_MAX_QUERIES = 50
+
+
+@api_bp.route("/batch", methods=["POST"])
+@login_required
+def batch():
+    """Many rankings/relays/results sub-queries in one round trip.
+
+    Body: {"defaults": {...}, "queries": [{"id": "...", "type": "rankings"|"relays"|"results", ...}]}.
+    Each query is merged over defaults. Access is resolved once and every
+    team-season snapshot is loaded once. All validation and database work
+    (selections, event names, snapshots, results queries) happens on the
+    request thread; only the in-memory ranking and relay computations run
+    on a thread pool. Every item reports its own status.
+    """
+    data = _json_body()
+    queries = data.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise ApiError("queries must be a non-empty list")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise ApiError(f"At most {BATCH_MAX_QUERIES} queries per batch")
+    defaults = data.get("defaults") or {}
+    if not isinstance(defaults, dict):
+        raise ApiError("defaults must be an object")
+
+    pairs = team_season_pairs(current_user.id)
+    snapshots = {}                   # gender -> {'tid:yr': snapshot}
+    items, jobs = [], {}
+    for i, query in enumerate(queries):
+        item = {**defaults, **(query if isinstance(query, dict) else {})}
+        items.append({"id": item.get("id", i), "type": item.get("type")})
+        try:
+            kind = _choice(item, "type", BATCH_TYPES, None)
+            if kind == "results":
+                rows, next_cursor = results_page(MultiDict(item))
+                items[i].update(status=200, data={"rows": rows, "next_cursor": next_cursor})
+                continue
+            selected, gender, _ = _selection(item, pairs)
+            snaps = snapshots.setdefault(gender, {})
+            for tid, _tname, yr in selected:
+                if f"{tid}:{yr}" not in snaps:
+                    snaps[f"{tid}:{yr}"] = load_snapshot(tid, yr, gender)
+            if kind == "rankings":
+                event_id = _int(item, "event_id", None)
+                jobs[i] = partial(rankings_payload, item, pairs, event_id, snaps,
+                                  _event_name(event_id))
+            else:
+                jobs[i] = partial(relays_payload, item, pairs, snaps)
+        except ApiError as e:
+            items[i].update(status=e.status, error=e.message)
+
+    if jobs:
+        app = current_app._get_current_object()
+
+        def run(job):
+            with app.app_context():
+                return job()
+
+        workers = min(len(jobs), current_app.config.get("API_BATCH_WORKERS", 4))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {i: pool.submit(run, job) for i, job in jobs.items()}
+        for i, future in futures.items():
+            try:
+                items[i].update(status=200, data=future.result())
+            except ApiError as e:
+                items[i].update(status=e.status, error=e.message)
+            except Exception as e:
+                log.exception("Batch item %s failed", items[i]["id"])
+                items[i].update(status=500, error=str(e))
+
+    return jsonify(results=items)
+
+
+@api_bp.route("/export", methods=["POST"])
+@login_required
+def export():
+    """Download selected sheets as xlsx, a zip of CSVs, or a zip of Parquet files.
+
+    Body: {"team_seasons": [...], "genders": ["M", "F"], "sheets": ["100 Fly",
+    "relay_medley:scored", ...], "format": "xlsx"|"csv"|"parquet", "top_n",
+    "excluded", "async"}. Empty sheets exports everything. Finished files are
+    cached by a hash of their inputs (the ETag). Large exports, or "async":
+    true, answer 202 with a URL to poll instead of blocking.
+    """
+    data = _json_body()
+    pairs = team_season_pairs(current_user.id)
+    selected, _, excluded = _selection(data, pairs)
+    genders = _str_list(data, "genders", [data.get("gender", "M")])
+    sheets = _str_list(data, "sheets", [])
+    fmt = data.get("format", "xlsx")
+    if not isinstance(fmt, str):
+        raise ApiError("format must be a string")
+    try:
+        export_req = export_request(sheets, genders, fmt, _int(data, "top_n", 16, minimum=1))
+    except ValueError as e:
+        raise ApiError(str(e))
+
+    background = data.get("async")
+    if background is None:
+        units = len(export_req.specs()) * len(selected)
+        background = units > current_app.config.get("EXPORT_ASYNC_UNITS", 200)
+    keys = {f"{tid}:{yr}" for tid, _, yr in selected}
+    choices_map = {f"{tid}:{yr}": team_season_label(tname, yr) for tid, tname, yr in selected}
+    key, ready = get_or_build(
+        export_req, selected, excluded, choices_map,
+        lambda gs: {g: load_snapshots(selected, keys, g) for g in gs},
+        background=bool(background),
+    )
+    if ready:
+        return send_export(key, export_meta(export_req, selected))
+    url = url_for("api.export_download", key=key)
+    response = jsonify(status="pending", key=key, url=url)
+    response.status_code = 202
+    response.headers["Location"] = url
+    return response
+
+
+@api_bp.route("/exports/<key>")
+@login_required
+def export_download(key):
+    """A cached export by key: the file, 202 while its job runs, or 404."""
+    meta = export_cache().get(key) if _EXPORT_KEY.fullmatch(key) else None
+    if meta is not None:
+        if not all(can_access(current_user.id, tid, yr) for tid, yr in meta["team_seasons"]):
+            raise ApiError("Export not found", 404)
+        return send_export(key, meta)
+    job = job_status(key) if _EXPORT_KEY.fullmatch(key) else None
+    if job is None:
+        raise ApiError("Export not found", 404)
+    status, meta = job
+    if not all(can_access(current_user.id, tid, yr) for tid, yr in meta["team_seasons"]):
+        raise ApiError("Export not found", 404)
+    if status == "pending":
+        return jsonify(status="pending", key=key), 202
+    raise ApiError(f"Export {status}", 500)
 
 
 @api_bp.route("/import", methods=["POST"])
 @login_required
+@require_scope("import")
 def api_import():
     """Import from SwimCloud. Body: {"team_name": "...", "gender": "M"|"F", "year": 2025}."""
     data      = request.get_json(silent=True) or {}
@@ -170,3 +630,14 @@ def api_import():
         times_imported=result.times_count,
         events=result.event_count,
     ), status
+
+
+@api_bp.route("/debug/solver", methods=["GET", "DELETE"])
+@login_required
+def debug_solver():
+    """Medley solver statistics for this process; DELETE resets them. Needs DEBUG_API."""
+    if not current_app.config.get("DEBUG_API"):
+        raise ApiError("Not found", 404)
+    if request.method == "DELETE":
+        solver_stats.medley.reset()
+    return jsonify(medley=solver_stats.medley.summary())
@@ -3,17 +3,23 @@
 import logging
 import os
 import sys
+import time
 
+import click
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from flask import Flask, render_template, jsonify
 from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from config import Config
-from extensions import db, login_manager, cache
+from extensions import db, login_manager, cache, orjson, OrjsonProvider
 from routes import main as main_bp
 from api import api_bp
+from services import db_routing, metrics, query_profiler, solver_stats, tracing
+from services.event_registry import registry
+import migrations
 
 
 def _configure_logging(app):
@@ -31,6 +37,43 @@ def _configure_logging(app):
     logging.getLogger("swimcloud_scraper").setLevel(logging.INFO)
 
 
+def init_schema(app, attempts=1, delay=1.0):
+    """create_all + in-place upgrades, retrying while the database is still starting."""
+    with app.app_context():
+        for attempt in range(1, attempts + 1):
+            try:
+                db.create_all()
+                return migrations.upgrade()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                if attempt == attempts:
+                    raise
+                app.logger.warning("Schema init attempt %d failed: %s", attempt, e)
+                time.sleep(delay)
+
+
+def warm(app):
+    """Build per-process state up front so preforked workers start warm.
+
+    Loads the event registry and compiles every template, then drops the
+    master's DB connections so no worker inherits a shared socket. Each
+    worker's copy of the registry still reloads when the shared events data
+    version moves, so events created after the fork are picked up.
+    """
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        try:
+            registry().load()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            app.logger.warning("Event registry not preloaded (run `flask init-db`): %s", e)
+        db.session.remove()
+        for engine in (*db.engines.values(), *db_routing.engines().values()):
+            if engine.url.database not in (None, "", ":memory:"):
+                engine.dispose()
+
+
 def create_app(test_config=None):
     """Flask app factory. test_config overrides for pytest."""
     app = Flask(__name__)
@@ -40,24 +83,55 @@ def create_app(test_config=None):
         app.config.update(test_config)
 
     _configure_logging(app)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
 
-    db.init_app(app)
+    db_routing.init_app(app)          # engines + read/write routing, then db.init_app
     login_manager.init_app(app)
     cache.init_app(app)
+    metrics.init_app(app)
+    tracing.init_app(app)
+    solver_stats.init_app(app)
+    query_profiler.init_app(app)
 
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix="/api")
 
-    with app.app_context():
-        import time as _time
-        for attempt in range(5):
-            try:
-                db.create_all()
-                break
-            except Exception as e:
-                app.logger.warning("db.create_all() attempt %d failed: %s", attempt + 1, e)
-                db.session.rollback()
-                _time.sleep(1)
+    if app.config["AUTO_CREATE_SCHEMA"]:
+        init_schema(app)
+    if app.config["WARM_ON_START"]:
+        warm(app)
+
+    @app.cli.command("init-db")
+    @click.option("--attempts", default=10, show_default=True,
+                  help="Retries, one second apart, while the database comes up.")
+    def init_db(attempts):
+        """Create missing tables and apply schema upgrades (run once before starting workers)."""
+        applied = init_schema(app, attempts=attempts)
+        print("\n".join(applied) or "Schema already up to date.")
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db():
+        """Apply in-place schema upgrades to an existing database."""
+        applied = migrations.upgrade()
+        print("\n".join(applied) or "Schema already up to date.")
+
+    @app.cli.command("generate-data")
+    @click.option("--teams", default=100, show_default=True)
+    @click.option("--swimmers", default=40, show_default=True, help="Roster size per season.")
+    @click.option("--seasons", default=10, show_default=True)
+    @click.option("--users", default=50, show_default=True, help="Coaches with overlapping grants.")
+    @click.option("--seed", default=0, show_default=True)
+    @click.option("--last-season", default=2025, show_default=True)
+    @click.option("--batch-size", default=20_000, show_default=True)
+    def generate_data(teams, swimmers, seasons, users, seed, last_season, batch_size):
+        """Bulk-insert a deterministic synthetic league (see services/datagen.py)."""
+        from services.datagen import generate, COACH_PASSWORD
+        stats = generate(teams=teams, swimmers=swimmers, seasons=seasons, users=users,
+                         seed=seed, last_season=last_season, batch_size=batch_size)
+        print(f"{stats.teams} teams, {stats.swimmers} swimmers, {stats.times} times, "
+              f"{stats.users} coaches ({stats.grants} grants) in {stats.seconds:.1f}s "
+              f"({stats.rows_per_sec:,.0f} times/s). Coach password: {COACH_PASSWORD}")
 
     @app.route("/health")
     def health():
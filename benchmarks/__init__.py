@@ -0,0 +1 @@
+# Scoring-engine and endpoint benchmarks. Run with: python -m benchmarks.run
@@ -0,0 +1,472 @@
+# Load test: how many concurrent coaches one box serves before /select degrades.
+# Spins the app up on a real HTTP server thread over a services.datagen league (file
+# SQLite), with SwimCloud replaced by a local stub server, then drives simulated
+# coaches: log in, open the dashboard, select team-seasons, toggle an exclusion, page
+# relay views, export, and sometimes import a team.
+#
+#   python -m benchmarks.load                                  # closed loop, 8 users, 30 s
+#   python -m benchmarks.load --rate 4 --duration 60           # open loop: 4 sessions/s
+#   python -m benchmarks.load --users 32 --server-threads 4 --scale large
+#   python -m benchmarks.load --url http://127.0.0.1:5001      # a running server whose DB
+#                                                              # came from `flask generate-data`
+#
+# Reports throughput and p50/p95/p99 per action. Exits 1 when the error rate is over
+# --max-error-rate.
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from benchmarks.run import SCALES
+from services.scoring import RELAYS
+
+ACTIONS = ('login', 'open_dashboard', 'select_teams', 'toggle_exclusion',
+           'page_relays', 'export', 'import')
+RELAY_PAGES = 3
+DEFAULT_MAX_ERROR_RATE = 0.01
+
+_CSRF = re.compile(r'name="csrf_token"[^>]*value="([^"]*)"')
+_TEAM = re.compile(r'<input[^>]*name="teams"[^>]*value="(\d+:\d+)"')
+_EVENT = re.compile(r'<option[^>]*value="(\d+)"')
+_TIME_ID = re.compile(r'name="time_id" value="(\d+)"')
+
+
+# ─── Recording ───────────────────────────────────────────────────────────────
+
+@dataclass
+class Sample:
+    action: str
+    ms: float
+    ok: bool
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+        self.lags = []            # open loop: ms between a session's arrival and its start
+        self.seconds = 0.0
+
+    def add(self, action, ms, ok):
+        with self._lock:
+            self.samples.append(Sample(action, ms, ok))
+
+    def lag(self, ms):
+        with self._lock:
+            self.lags.append(ms)
+
+
+def percentiles(values):
+    """(p50, p95, p99) of values, or Nones when empty."""
+    if not values:
+        return None, None, None
+    if len(values) == 1:
+        return (values[0],) * 3
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+def summarize(recorder, seconds):
+    """{'seconds', 'actions', 'errors', 'throughput', 'by_action': {...}, 'lag_ms': {...}}."""
+    by_action = {}
+    for action in ACTIONS:
+        samples = [s for s in recorder.samples if s.action == action]
+        if not samples:
+            continue
+        p50, p95, p99 = percentiles([s.ms for s in samples])
+        by_action[action] = {
+            'count': len(samples),
+            'errors': sum(not s.ok for s in samples),
+            'per_sec': len(samples) / seconds if seconds else 0.0,
+            'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+            'max_ms': max(s.ms for s in samples),
+        }
+    p50, p95, p99 = percentiles(recorder.lags)
+    return {
+        'seconds': seconds,
+        'actions': len(recorder.samples),
+        'errors': sum(not s.ok for s in recorder.samples),
+        'throughput': len(recorder.samples) / seconds if seconds else 0.0,
+        'by_action': by_action,
+        'lag_ms': {'p50': p50, 'p95': p95, 'p99': p99} if recorder.lags else None,
+    }
+
+
+def format_report(summary):
+    lines = [
+        f"{summary['actions']} actions ({summary['errors']} errors) in "
+        f"{summary['seconds']:.1f} s: {summary['throughput']:.1f} actions/s",
+        f"  {'action':<17} {'count':>6} {'err':>4} {'per s':>7} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}",
+    ]
+    for action, row in summary['by_action'].items():
+        lines.append(
+            f"  {action:<17} {row['count']:>6} {row['errors']:>4} {row['per_sec']:>7.2f} "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}"
+        )
+    if summary['lag_ms']:
+        lag = summary['lag_ms']
+        lines.append(f"  session start lag p50/p95/p99: {lag['p50']:.0f} / {lag['p95']:.0f} / "
+                     f"{lag['p99']:.0f} ms (grows when arrivals outpace the users pool)")
+    return '\n'.join(lines)
+
+
+# ─── Simulated coach ─────────────────────────────────────────────────────────
+
+class Coach:
+    """One browser session walking the dashboard; each step is timed under its action."""
+
+    def __init__(self, base_url, username, password, rng, recorder, import_rate=0.0, think=0.0):
+        self.base_url = base_url.rstrip('/')
+        self.username, self.password = username, password
+        self.rng = rng
+        self.recorder = recorder
+        self.import_rate = import_rate
+        self.think = think
+        self.http = requests.Session()
+        self.csrf = ''
+        self.form = {}
+        self.events = []
+        self.time_ids = []
+        self.excluded = set()
+
+    def _request(self, action, method, path, ok=lambda r: r.status_code < 400, **kwargs):
+        """The response, or None on failure. action=None leaves the request untimed."""
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=120, **kwargs)
+            passed = ok(response)
+        except requests.RequestException:
+            response, passed = None, False
+        if action:
+            self.recorder.add(action, (time.perf_counter() - start) * 1000, passed)
+        if response is not None:
+            found = _CSRF.search(response.text)
+            if found:
+                self.csrf = found.group(1)
+        return response if passed else None
+
+    def _post_select(self, action, **fields):
+        data = {**self.form, 'csrf_token': self.csrf, 'excluded': sorted(self.excluded), **fields}
+        return self._request(action, 'POST', '/select', data=data)
+
+    def run(self):
+        """The full session; stops at the first failed step."""
+        steps = (self.login, self.open_dashboard, self.select_teams, self.toggle_exclusion,
+                 self.page_relays, self.export, self.maybe_import)
+        for i, step in enumerate(steps):
+            if i and self.think:
+                time.sleep(self.think)
+            if not step():
+                return False
+        return True
+
+    def _form_post(self, action, path, data, ok):
+        """GET path for its CSRF token, then POST data; both timed as one action."""
+        start = time.perf_counter()
+        response = self._request(None, 'GET', path)
+        if response is not None:
+            response = self._request(None, 'POST', path, data={**data, 'csrf_token': self.csrf},
+                                     allow_redirects=False, ok=ok)
+        self.recorder.add(action, (time.perf_counter() - start) * 1000, response is not None)
+        return response is not None
+
+    def login(self):
+        return self._form_post('login', '/login',
+                               {'username': self.username, 'password': self.password},
+                               ok=lambda r: r.status_code == 302)
+
+    def open_dashboard(self):
+        response = self._request('open_dashboard', 'GET', '/select')
+        if response is None:
+            return False
+        teams = list(dict.fromkeys(_TEAM.findall(response.text)))
+        self.events = _EVENT.findall(response.text)
+        if not teams or not self.events:
+            return False
+        chosen = self.rng.sample(teams, min(len(teams), self.rng.randint(1, 4)))
+        self.form = {'teams': chosen, 'gender': self.rng.choice('MF'), 'top_n': '16'}
+        return True
+
+    def select_teams(self):
+        self.form['event'] = self.rng.choice(self.events)
+        response = self._post_select('select_teams')
+        if response is None:
+            return False
+        self.time_ids = _TIME_ID.findall(response.text)
+        return True
+
+    def toggle_exclusion(self):
+        if not self.time_ids:
+            return True
+        dropped = self.rng.choice(self.time_ids)
+        kept = [t for t in self.time_ids if t != dropped]
+        response = self._post_select('toggle_exclusion', time_id=self.time_ids,
+                                     include_time_id=kept)
+        self.excluded.add(int(dropped))
+        return response is not None
+
+    def page_relays(self):
+        relay = self.rng.choice(sorted(RELAYS))
+        scoring = self.rng.choice(('scored', 'unscored'))
+        for page in range(1, RELAY_PAGES + 1):
+            if self._post_select('page_relays', event=relay, scoring_mode=scoring,
+                                 top_n=str(16 * RELAY_PAGES), page=str(page)) is None:
+                return False
+        return True
+
+    def export(self):
+        return self._post_select('export', export_excel='1') is not None
+
+    def maybe_import(self):
+        if self.rng.random() >= self.import_rate:
+            return True
+        team = f"Stub Team {self.rng.randint(1, 20)}"
+        return self._form_post('import', '/scrape',
+                               {'team_name': team, 'gender': self.rng.choice('MF'), 'year': '2025'},
+                               ok=lambda r: r.status_code == 200 and 'flash-success' in r.text)
+
+
+def drive(base_url, usernames, password, users=8, rate=0.0, duration=30.0, think=0.0,
+          import_rate=0.05, seed=0):
+    """Run sessions against base_url and return the Recorder.
+
+    rate > 0 is an open loop: sessions arrive as a Poisson process at rate per
+    second for duration seconds and queue for the `users` pool. rate == 0 is a
+    closed loop: each of `users` runs sessions back to back until duration
+    (at least one each).
+    """
+    recorder = Recorder()
+    rng = random.Random(seed)
+
+    def session(n, arrival=None):
+        if arrival is not None:
+            recorder.lag((time.perf_counter() - arrival) * 1000)
+        session_rng = random.Random(seed * 1_000_003 + n)
+        Coach(base_url, session_rng.choice(usernames), password, session_rng, recorder,
+              import_rate, think).run()
+
+    start = time.perf_counter()
+    deadline = start + duration
+    with ThreadPoolExecutor(users) as pool:
+        if rate > 0:
+            arrival, n = start, 0
+            while arrival < deadline:
+                time.sleep(max(0.0, arrival - time.perf_counter()))
+                pool.submit(session, n, arrival)
+                arrival += rng.expovariate(rate)
+                n += 1
+        else:
+            counter = iter(range(sys.maxsize))
+
+            def worker():
+                session(next(counter))
+                while time.perf_counter() < deadline:
+                    session(next(counter))
+
+            for _ in range(users):
+                pool.submit(worker)
+    recorder.seconds = time.perf_counter() - start
+    return recorder
+
+
+# ─── SwimCloud stub ──────────────────────────────────────────────────────────
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """/api/search/ and /api/splashes/top_times/ with deterministic fake payloads."""
+    latency = 0.0
+    roster = 25
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == '/api/search/':
+            query = params.get('q', '')
+            team_id = 900_000 + zlib.crc32(query.encode()) % 100_000
+            body = [{'name': query, 'abbr': query[:4].upper(), 'url': f'/team/{team_id}/'}]
+        elif url.path == '/api/splashes/top_times/':
+            body = {'results': self._times(params)}
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _times(self, params):
+        stroke, distance, _ = params['event'].split('|')
+        team_id = int(params['team_id'])
+        rng = random.Random(f"{team_id}:{params['gender']}:{params['event']}")
+        pace = {'1': 0.52, '2': 0.58, '3': 0.65, '4': 0.57, '5': 0.61}[stroke]
+        base = int(distance) * pace * (1.08 if params['gender'] == 'F' else 1.0)
+        return [
+            {'swimmer_id': team_id * 100 + i, 'display_name': f"Stub Swimmer {team_id}-{i}",
+             'eventtime': round(base * rng.uniform(1.0, 1.15), 2)}
+            for i in range(self.roster) if rng.random() < 0.6
+        ]
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def swimcloud_stub(latency_ms=0.0):
+    """Point swimcloud_scraper at a local stub server for the duration of the block."""
+    import swimcloud_scraper
+
+    handler = type('StubHandler', (_StubHandler,), {'latency': latency_ms / 1000})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    original = swimcloud_scraper._API_BASE
+    swimcloud_scraper._API_BASE = f"http://127.0.0.1:{server.server_port}"
+    try:
+        yield swimcloud_scraper._API_BASE
+    finally:
+        swimcloud_scraper._API_BASE = original
+        server.shutdown()
+        server.server_close()
+
+
+# ─── App server ──────────────────────────────────────────────────────────────
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server handling connections on a fixed pool of `threads`, like a
+    Gunicorn worker with --threads, so queueing shows up in the latencies."""
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app, handler=_QuietHandler)
+        self._pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        self._pool.shutdown(wait=True)
+        super().server_close()
+
+
+@contextmanager
+def serve_app(sizes, coaches=20, seed=0, server_threads=8, cache_type='SimpleCache'):
+    """Yield (base_url, usernames) for the app on a background server over a fresh league."""
+    from app import create_app
+    from extensions import db
+    from services.datagen import generate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(test_config={
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'load.db'),
+            'SECRET_KEY': 'load',
+            'CACHE_TYPE': cache_type,
+            'EXPORT_CACHE_DIR': os.path.join(tmp, 'exports'),
+            'AUTO_CREATE_SCHEMA': True,
+        })
+        with app.app_context():
+            stats = generate(seed=seed, users=coaches, **sizes)
+            db.session.remove()
+        server = PooledWSGIServer('127.0.0.1', 0, app, server_threads)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield (f"http://127.0.0.1:{server.server_port}",
+                   [f"coach{n + 1:03d}" for n in range(stats.users)])
+        finally:
+            server.shutdown()
+            server.server_close()
+            with app.app_context():
+                db.engine.dispose()
+
+
+def run(scale='small', coaches=20, users=8, rate=0.0, duration=30.0, think=0.0,
+        import_rate=0.05, server_threads=8, scraper_latency_ms=50.0, seed=0,
+        cache_type='SimpleCache'):
+    """Spin up app + stub, drive the load, return the summary dict."""
+    from services.datagen import COACH_PASSWORD
+
+    with swimcloud_stub(scraper_latency_ms), \
+            serve_app(SCALES[scale], coaches, seed, server_threads, cache_type) as (url, names):
+        recorder = drive(url, names, COACH_PASSWORD, users, rate, duration, think,
+                         import_rate, seed)
+    return summarize(recorder, recorder.seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent-coach load test.')
+    parser.add_argument('--scale', default='small', choices=sorted(SCALES))
+    parser.add_argument('--coaches', type=int, default=20, help='distinct coach accounts')
+    parser.add_argument('--users', type=int, default=8, help='concurrent simulated coaches')
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help='session arrivals per second (0: closed loop)')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds')
+    parser.add_argument('--think', type=float, default=0.0, help='seconds between steps')
+    parser.add_argument('--import-rate', type=float, default=0.05,
+                        help='fraction of sessions that also import a team')
+    parser.add_argument('--server-threads', type=int, default=8)
+    parser.add_argument('--scraper-latency', type=float, default=50.0,
+                        help='stub SwimCloud response delay, ms')
+    parser.add_argument('--cache', default='SimpleCache', help='CACHE_TYPE for the app')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='drive an already running server instead (no imports)')
+    parser.add_argument('--max-error-rate', type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument('--output', help='also write the summary JSON here')
+    args = parser.parse_args(argv)
+
+    if args.url:
+        from services.datagen import COACH_PASSWORD
+        names = [f"coach{n + 1:03d}" for n in range(args.coaches)]
+        recorder = drive(args.url, names, COACH_PASSWORD, args.users, args.rate,
+                         args.duration, args.think, 0.0, args.seed)
+        summary = summarize(recorder, recorder.seconds)
+    else:
+        summary = run(args.scale, args.coaches, args.users, args.rate, args.duration,
+                      args.think, args.import_rate, args.server_threads,
+                      args.scraper_latency, args.seed, args.cache)
+
+    print(f"[{args.url or args.scale}] users={args.users} rate={args.rate or 'closed'} "
+          f"server_threads={args.server_threads}")
+    print(format_report(summary))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+    error_rate = summary['errors'] / summary['actions'] if summary['actions'] else 1.0
+    if error_rate > args.max_error_rate:
+        print(f"FAIL error rate {error_rate:.1%} > {args.max_error_rate:.1%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# Times each scoring-engine stage and the main /select and /api calls at several
+# data scales on in-memory SQLite, and compares them with benchmarks/baselines.json.
+#
+#   python -m benchmarks.run                        # compare against baselines
+#   python -m benchmarks.run --scales small --update   # rewrite those baselines
+#
+# Exits 1 when any stage is slower than its baseline by more than --threshold, as
+# long as the baselines were recorded on this host (see host_info); on any other
+# host regressions are only reported, unless --strict.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from app import create_app
+from extensions import db
+from models import User, Event
+from services.access import team_season_pairs, team_season_label
+from services.datagen import generate
+from services.export_service import ExportRequest, export_file
+from services.scoring import (
+    build_all_pools, build_relay_view, pick_greedy_squads, pick_scored_combos,
+    rank_scored_combos, _best_medley_assignment, _attach_team_info,
+)
+from services.snapshot import load_snapshots
+
+SCALES = {
+    'tiny':   dict(teams=2, swimmers=8, seasons=1),
+    'small':  dict(teams=4, swimmers=20, seasons=1),
+    'medium': dict(teams=10, swimmers=30, seasons=2),
+    'large':  dict(teams=24, swimmers=40, seasons=3),
+}
+DEFAULT_SCALES = ('small', 'medium')
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+DEFAULT_THRESHOLD = 0.25      # fail when >25% slower than baseline...
+MIN_DELTA_MS = 2.0            # ...and slower by at least this much (ignores jitter on tiny stages)
+BENCH_PASSWORD = 'Benchpass1'
+
+
+def _median_ms(fn, repeat):
+    warm = fn()                           # warm-up: imports, caches, statement compilation
+    if getattr(warm, 'status_code', 200) >= 400:
+        raise RuntimeError(f"benchmark request failed with HTTP {warm.status_code}")
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def _stages(client, user_id, gender='M'):
+    """{stage name: zero-arg callable} over everything the user can see."""
+    pairs = team_season_pairs(user_id)
+    selected = {f"{tid}:{yr}" for tid, _, yr in pairs}
+    choices = {f"{tid}:{yr}": team_season_label(tname, yr) for tid, tname, yr in pairs}
+    snaps = load_snapshots(pairs, selected, gender)
+    medley = build_all_pools(snaps, 'relay_medley', set())
+    free = build_all_pools(snaps, 'relay_400_free', set())
+    combos = []
+    for key, pool in medley.items():
+        found = pick_scored_combos(pool, 'relay_medley', 2)
+        _attach_team_info(found, key, choices)
+        combos.extend(found)
+    fly = Event.query.filter_by(name='100 Fly').one().id
+    team_seasons = sorted(selected)
+    form = {'teams': team_seasons, 'gender': gender, 'top_n': '16'}
+
+    def export():
+        export_file(ExportRequest(genders=(gender,)), {gender: snaps}, set(), choices, workers=1).close()
+
+    return {
+        'snapshot_load':        lambda: load_snapshots(pairs, selected, gender),
+        'medley_assignment':    lambda: [_best_medley_assignment(p) for p in medley.values()],
+        'greedy_squads':        lambda: [pick_greedy_squads(p, 'relay_400_free', 16) for p in free.values()],
+        'rank_scored_combos':   lambda: rank_scored_combos([dict(c) for c in combos]),
+        'relay_view_scored':    lambda: build_relay_view(medley, 'relay_medley', 'scored', 999,
+                                                         'points', choices, 16, 1, 16),
+        'export_xlsx':          export,
+        'http_select_event':    lambda: client.post('/select', data={**form, 'event': str(fly)}),
+        'http_select_medley':   lambda: client.post('/select', data={
+            **form, 'event': 'relay_medley', 'scoring_mode': 'scored'}),
+        'http_api_rankings':    lambda: client.get(f'/api/events/{fly}/rankings', query_string={
+            'team_seasons': ','.join(team_seasons), 'gender': gender}),
+        'http_api_relays':      lambda: client.post('/api/relays', json={
+            'team_seasons': team_seasons, 'relay': 'relay_medley', 'gender': gender,
+            'scoring_mode': 'scored'}),
+    }
+
+
+def bench_scale(sizes, repeat=5, seed=0):
+    """{stage: median ms} for one data scale (teams/swimmers/seasons) on a fresh in-memory DB."""
+    with tempfile.TemporaryDirectory() as export_dir:
+        app = create_app(test_config={
+            'TESTING': True,
+            'WTF_CSRF_ENABLED': False,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'SECRET_KEY': 'bench',
+            'CACHE_TYPE': 'NullCache',            # measure the work, not cache hits
+            'EXPORT_CACHE_DIR': export_dir,
+        })
+        with app.app_context():
+            db.create_all()
+            user = User(username='bench')
+            user.set_password(BENCH_PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+            generate(seed=seed, grant_user_id=user.id, **sizes)
+
+            client = app.test_client()
+            client.post('/login', data={'username': 'bench', 'password': BENCH_PASSWORD})
+            results = {
+                name: _median_ms(fn, repeat)
+                for name, fn in _stages(client, user.id).items()
+            }
+            db.session.remove()
+            db.drop_all()
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """Human-readable regressions of results vs baseline ({scale: {stage: ms}})."""
+    regressions = []
+    for scale, stages in results.items():
+        for stage, ms in stages.items():
+            base = baseline.get(scale, {}).get(stage)
+            if base is None:
+                continue
+            if ms > base * (1 + threshold) and ms - base > min_delta_ms:
+                regressions.append(
+                    f"{scale}/{stage}: {ms:.1f} ms vs baseline {base:.1f} ms "
+                    f"(+{(ms / base - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def host_info():
+    """What makes absolute timings comparable: the host, its CPU and the Python build."""
+    return {
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'python': platform.python_version(),
+    }
+
+
+def host_mismatch(meta, host=None):
+    """'key: recorded != here' for each host_info field that differs from the baseline meta."""
+    host = host or host_info()
+    return [f"{k}: {meta.get(k)!r} != {v!r}" for k, v in host.items() if meta.get(k) != v]
+
+
+def load_baselines(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'meta': {}, 'scales': {}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scoring-engine and endpoint benchmarks.')
+    parser.add_argument('--scales', default=','.join(DEFAULT_SCALES),
+                        help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update', action='store_true', help='write results as the new baselines')
+    parser.add_argument('--strict', action='store_true',
+                        help='fail on regressions even when the baselines come from another host')
+    parser.add_argument('--output', help='also write results JSON here')
+    args = parser.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    results = {}
+    for scale in scales:
+        results[scale] = bench_scale(SCALES[scale], args.repeat, args.seed)
+        width = max(map(len, results[scale]))
+        print(f"[{scale}] {SCALES[scale]}")
+        for stage, ms in results[scale].items():
+            print(f"  {stage:<{width}}  {ms:10.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    baselines = load_baselines(args.baseline)
+    if args.update:
+        baselines['scales'].update(results)
+        baselines['meta'] = {**host_info(), 'repeat': args.repeat, 'seed': args.seed}
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baselines updated: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baselines['scales'], args.threshold)
+    mismatch = host_mismatch(baselines['meta'])
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("No regressions.")
+    if regressions and mismatch and not args.strict:
+        print("WARNING baselines were recorded on another host; not failing "
+              f"({'; '.join(mismatch)}). Run with --update here to gate on this machine.")
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# Worker startup time: `import app` and create_app() in fresh interpreters, the way a
+# Gunicorn worker (or a preloading master) pays for them. Heavy export dependencies
+# must stay unloaded until the first export.
+#
+#   python -m benchmarks.startup               # median of 5 runs against the budgets
+#   python -m benchmarks.startup --runs 10
+#
+# Exits 1 when a median is over budget or a lazy dependency was imported at startup.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 1000.0
+CREATE_APP_BUDGET_MS = 250.0
+LAZY_MODULES = ('openpyxl', 'pyarrow', 'numpy')
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'loaded': [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def probe(env=None):
+    """One fresh interpreter: {'import_ms', 'create_app_ms', 'loaded'}."""
+    with tempfile.TemporaryDirectory() as tmp:
+        run_env = {
+            **os.environ,
+            'DATABASE_URL': 'sqlite:///' + os.path.join(tmp, 'startup.db'),
+            'AUTO_CREATE_SCHEMA': '0',
+            'WARM_ON_START': '0',
+            **(env or {}),
+        }
+        run_env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        out = subprocess.run(
+            [sys.executable, '-c', _PROBE % (LAZY_MODULES,)],
+            cwd=ROOT, env=run_env, capture_output=True, text=True, check=True,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(runs=5, env=None):
+    """Medians over runs, plus every lazy module any run imported."""
+    samples = [probe(env) for _ in range(runs)]
+    return {
+        'import_ms': statistics.median(s['import_ms'] for s in samples),
+        'create_app_ms': statistics.median(s['create_app_ms'] for s in samples),
+        'loaded': sorted({m for s in samples for m in s['loaded']}),
+    }
+
+
+def problems(result, import_budget=IMPORT_BUDGET_MS, create_app_budget=CREATE_APP_BUDGET_MS):
+    out = []
+    if result['import_ms'] > import_budget:
+        out.append(f"import app {result['import_ms']:.0f} ms > {import_budget:.0f} ms")
+    if result['create_app_ms'] > create_app_budget:
+        out.append(f"create_app {result['create_app_ms']:.0f} ms > {create_app_budget:.0f} ms")
+    if result['loaded']:
+        out.append(f"imported at startup: {', '.join(result['loaded'])}")
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--create-app-budget', type=float, default=CREATE_APP_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    print(f"import app   {result['import_ms']:8.1f} ms  (budget {args.import_budget:.0f})")
+    print(f"create_app   {result['create_app_ms']:8.1f} ms  (budget {args.create_app_budget:.0f})")
+    failed = problems(result, args.import_budget, args.create_app_budget)
+    for line in failed:
+        print(f"FAIL {line}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,7 +13,65 @@ class Config:
         "sqlite:///" + os.path.join(basedir, "swim.db"),
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # create_app creates/upgrades the schema itself (dev, tests). Production runs
+    # `flask init-db` once instead, so worker startup never touches DDL.
+    AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "1") == "1"
+    # Preload the event registry and templates in create_app (the Gunicorn master).
+    WARM_ON_START = os.getenv("WARM_ON_START", "0") == "1"
+
+    # SQLite file databases: WAL and these pragmas on every connection, one writer
+    # connection per process and a pool of read-only connections for SELECTs, so
+    # imports don't stall dashboard reads. Ignored for other databases.
+    SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "1") == "1"
+    SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+    SQLITE_WRITE_TIMEOUT = int(os.getenv("SQLITE_WRITE_TIMEOUT", "30"))    # s, waiting for the writer
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+
+    # PostgreSQL connection pool, per process (and for the replica).
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    # Read replica for read-only paths (rankings, snapshots, /api/results, exports).
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+    # Seconds after a write during which read_only() paths stay on the primary.
+    REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "10"))
 
     CACHE_TYPE = os.getenv("CACHE_TYPE", "SimpleCache")
     CACHE_REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_TIMEOUT", "300"))
+
+    # Export sheets are computed on a pool of this many workers; "process" sidesteps
+    # the GIL for big selections at the cost of pickling snapshots to each worker.
+    EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "4"))
+    EXPORT_EXECUTOR = os.getenv("EXPORT_EXECUTOR", "thread")
+
+    # Finished exports, content-addressed by their inputs; oldest evicted past the cap.
+    EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(basedir, "export_cache"))
+    EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_MB", "256")) * 1024 * 1024
+    # Exports bigger than this many sheet x team-season units run as background jobs.
+    EXPORT_ASYNC_UNITS = int(os.getenv("EXPORT_ASYNC_UNITS", "200"))
+    EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+
+    # Tracing: fraction of requests exported as OTLP/JSON spans to TRACE_FILE or the log.
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")
+    TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(basedir, "traces.jsonl"))
+    # Debug: trace every request and attach a Server-Timing breakdown to the response.
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+    # Medley solver calls slower than this are logged with their search statistics.
+    MEDLEY_SLOW_MS = float(os.getenv("MEDLEY_SLOW_MS", "50"))
+    # Exposes GET /api/debug/solver (per-process optimizer statistics).
+    DEBUG_API = os.getenv("DEBUG_API", "0") == "1"
+
+    # Development: profile every request's SQL, warn on N+1 shapes and slow statements,
+    # and optionally write a report per request to QUERY_REPORT_DIR.
+    QUERY_PROFILER = os.getenv("QUERY_PROFILER", "0") == "1"
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+    QUERY_REPORT_DIR = os.getenv("QUERY_REPORT_DIR") or None
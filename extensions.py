@@ -1,12 +1,74 @@
 # Extensions live here so models/routes can import without circular deps.
 
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 from flask_login import LoginManager
 from flask_caching import Cache
 
-db = SQLAlchemy()
+from services.db_routing import RoutingSession
+from services.metrics import cache_family, record_cache
+from services.tracing import span
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 login_manager = LoginManager()
 login_manager.login_view = "main.login"
 
-cache = Cache()
+
+class InstrumentedCache(Cache):
+    """Flask-Caching Cache that counts hits and misses per key family and traces calls."""
+
+    def get(self, key):
+        with span("cache.get", family=cache_family(key)):
+            value = super().get(key)
+        record_cache(key, value is not None)
+        return value
+
+    def get_many(self, *keys):
+        with span("cache.get_many", keys=len(keys)):
+            values = super().get_many(*keys)
+        for key, value in zip(keys, values):
+            record_cache(key, value is not None)
+        return values
+
+    def set(self, key, *args, **kwargs):
+        with span("cache.set", family=cache_family(key)):
+            return super().set(key, *args, **kwargs)
+
+
+cache = InstrumentedCache()
+
+# Its own key namespace, so the cache.clear() every writer runs after committing
+# leaves the replica-read hold (services.db_routing.hold_replica) in place.
+replica_hold_cache = Cache(config={"CACHE_KEY_PREFIX": "replica_hold_"})
+
+
+def dialect_insert(table):
+    """INSERT construct for the session's dialect, so callers can use ON CONFLICT."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+try:
+    import orjson
+except ImportError:           # stdlib json via Flask's default provider
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; serializes large relay payloads cheaply."""
+
+    _OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._OPTIONS)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -1,8 +1,8 @@
-# Forms for login, register, scrape (import), and dashboard selection.
+# Forms for login, register, scrape (import), dashboard selection, and API tokens.
 
 from flask_wtf import FlaskForm
 from wtforms import (
-    StringField, PasswordField, SelectField,
+    StringField, PasswordField, SelectField, BooleanField,
     IntegerField, widgets, SelectMultipleField,
 )
 from wtforms.validators import (
@@ -94,3 +94,11 @@ class SelectionForm(FlaskForm):
         choices=[("speed", "Time"), ("points", "Points")],
         default="speed",
     )
+
+
+class ApiTokenForm(FlaskForm):
+    name = StringField(
+        "Token name",
+        validators=[DataRequired(), Length(max=80)],
+    )
+    allow_import = BooleanField("Allow imports (POST /api/import)")
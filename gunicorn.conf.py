@@ -0,0 +1,34 @@
+# Gunicorn settings (picked up automatically from the working directory).
+# Workers share a Prometheus multiprocess directory so /metrics sums every worker.
+# The app is preloaded and warmed once in the master, so workers fork ready to serve;
+# the schema is created beforehand by `flask init-db` (see Dockerfile).
+
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = True
+
+os.environ.setdefault("AUTO_CREATE_SCHEMA", "0")
+os.environ.setdefault("WARM_ON_START", "1")
+
+# Must exist before prometheus_client is imported, i.e. before the preloaded app.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "swim-prometheus")
+)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    """Start from an empty metrics directory; stale files from old workers would be summed in."""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
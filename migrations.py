@@ -0,0 +1,142 @@
+# In-place schema upgrades for databases created by older versions of models.py.
+# db.create_all() only adds missing tables, so column/index changes live here.
+# Every step is idempotent; run with: flask --app app:create_app upgrade-db
+
+import logging
+
+from sqlalchemy import inspect, select, text
+
+from extensions import db
+from models import Swimmer, Time, EventRanking
+from services import rankings
+
+log = logging.getLogger(__name__)
+
+# Indexes replaced by the covering indexes on Time.
+_LEGACY_INDEXES = [
+    "ix_time_event_time", "ix_time_swimmer", "ix_time_season",
+    "ix_time_swimmer_id", "ix_time_event_id", "ix_time_season_year",
+]
+
+
+def _columns(conn, table):
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _has_time_unique(conn):
+    insp = inspect(conn)
+    names = {ix["name"] for ix in insp.get_indexes("time")}
+    names |= {uc["name"] for uc in insp.get_unique_constraints("time")}
+    return "uq_time_swimmer_event_season" in names
+
+
+def _add_swimcloud_id(conn):
+    if "swimcloud_id" in _columns(conn, "swimmer"):
+        return False
+    conn.execute(text("ALTER TABLE swimmer ADD COLUMN swimcloud_id INTEGER"))
+    return True
+
+
+def _drop_legacy_indexes(conn):
+    existing = {ix["name"] for ix in inspect(conn).get_indexes("time")}
+    stale = [name for name in _LEGACY_INDEXES if name in existing]
+    for name in stale:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    return bool(stale)
+
+
+def _drop_global_swimcloud_index(conn):
+    """swimcloud_id is unique per team now (ux_swimmer_team_swimcloud_id)."""
+    existing = {ix["name"] for ix in inspect(conn).get_indexes("swimmer")}
+    if "ux_swimmer_swimcloud_id" not in existing:
+        return False
+    conn.execute(text("DROP INDEX ux_swimmer_swimcloud_id"))
+    return True
+
+
+def _time_centiseconds(conn):
+    """Numeric seconds -> integer hundredths (time_secs -> time_cs)."""
+    cols = _columns(conn, "time")
+    if "time_secs" not in cols:
+        return False
+    if "time_cs" not in cols:
+        conn.execute(text("ALTER TABLE time ADD COLUMN time_cs INTEGER"))
+    conn.execute(text(
+        "UPDATE time SET time_cs = CAST(ROUND(time_secs * 100) AS INTEGER) "
+        "WHERE time_cs IS NULL"
+    ))
+    conn.execute(text("ALTER TABLE time DROP COLUMN time_secs"))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE time ALTER COLUMN time_cs SET NOT NULL"))
+    return True
+
+
+def _dedupe_times(conn):
+    """Keep only the fastest row per (swimmer, event, season) before the unique index."""
+    if _has_time_unique(conn):
+        return False
+    result = conn.execute(text(
+        "DELETE FROM time WHERE id NOT IN ("
+        " SELECT id FROM ("
+        "  SELECT id, ROW_NUMBER() OVER ("
+        "   PARTITION BY swimmer_id, event_id, season_year ORDER BY time_cs, id"
+        "  ) AS rn FROM time"
+        " ) AS ranked WHERE rn = 1"
+        ")"
+    ))
+    return result.rowcount > 0
+
+
+def _create_indexes(conn):
+    created = False
+    if not _has_time_unique(conn):
+        # A unique index (not a table constraint) so SQLite can add it in
+        # place; ON CONFLICT accepts either.
+        conn.execute(text(
+            "CREATE UNIQUE INDEX uq_time_swimmer_event_season "
+            "ON time (swimmer_id, event_id, season_year)"
+        ))
+        created = True
+    for table in (Swimmer.__table__, Time.__table__):
+        existing = {ix["name"] for ix in inspect(conn).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                created = True
+    return created
+
+
+def _backfill_rankings(conn):
+    """Populate event_ranking for databases that predate it."""
+    has_times = conn.execute(select(Time.id).limit(1)).first()
+    has_rankings = conn.execute(select(EventRanking.time_id).limit(1)).first()
+    if not has_times or has_rankings:
+        return False
+    rankings.rebuild_all(conn)
+    return True
+
+
+STEPS = [
+    ("swimmer.swimcloud_id", _add_swimcloud_id),
+    ("drop legacy time indexes", _drop_legacy_indexes),
+    ("per-team swimcloud_id index", _drop_global_swimcloud_index),
+    ("time.time_cs centiseconds", _time_centiseconds),
+    ("dedupe time rows", _dedupe_times),
+    ("covering indexes", _create_indexes),
+    ("backfill event_ranking", _backfill_rankings),
+]
+
+
+def upgrade():
+    """Bring an existing database up to the current models. Returns applied step names."""
+    applied = []
+    with db.engine.begin() as conn:
+        tables = set(inspect(conn).get_table_names())
+        if not {"swimmer", "time", "event_ranking"} <= tables:
+            return applied
+        for name, step in STEPS:
+            if step(conn):
+                applied.append(name)
+    for name in applied:
+        log.info("schema upgrade applied: %s", name)
+    return applied
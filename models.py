@@ -4,7 +4,7 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from extensions import db
-from sqlalchemy import Index
+from sqlalchemy import Index, UniqueConstraint
 
 user_team_seasons = db.Table(
     "user_team_seasons",
@@ -34,7 +34,18 @@ class Team(db.Model):
 
 
 class Swimmer(db.Model):
+    __table_args__ = (
+        # One row per (team, SwimCloud swimmer): a transfer starts a new row and
+        # leaves the old team's history where it was.
+        Index("ux_swimmer_team_swimcloud_id", "team_id", "swimcloud_id", unique=True),
+        Index("ix_swimmer_team_name", "team_id", "name"),
+        # Covers the pool builders' team/gender filter and the name they project.
+        Index("ix_swimmer_team_gender", "team_id", "gender", "name",
+              postgresql_include=["id"]),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
+    swimcloud_id = db.Column(db.Integer)      # source-system id; NULL for seeded swimmers
     name = db.Column(db.String(100), nullable=False)
     gender = db.Column(db.String(1))
     team_id = db.Column(db.Integer, db.ForeignKey("team.id"))
@@ -51,15 +62,68 @@ class Event(db.Model):
 class Time(db.Model):
     __tablename__ = "time"
     __table_args__ = (
-        Index("ix_time_event_time", "event_id", "time_secs"),
-        Index("ix_time_season", "season_year"),
-        Index("ix_time_swimmer", "swimmer_id"),
+        UniqueConstraint("swimmer_id", "event_id", "season_year", name="uq_time_swimmer_event_season"),
+        # Rankings: event + season range, already in time order.
+        Index("ix_time_event_season_time", "event_id", "season_year", "time_cs", "swimmer_id",
+              postgresql_include=["id"]),
+        # Pool builders: per-swimmer probe for one event + season.
+        Index("ix_time_swimmer_event_season_time", "swimmer_id", "event_id", "season_year", "time_cs",
+              postgresql_include=["id"]),
     )
 
     id = db.Column(db.Integer, primary_key=True)
-    swimmer_id = db.Column(db.Integer, db.ForeignKey("swimmer.id"), index=True)
-    event_id = db.Column(db.Integer, db.ForeignKey("event.id"), index=True)
-    time_secs = db.Column(db.Numeric, nullable=False)
+    swimmer_id = db.Column(db.Integer, db.ForeignKey("swimmer.id"))
+    event_id = db.Column(db.Integer, db.ForeignKey("event.id"))
+    time_cs = db.Column(db.Integer, nullable=False)       # hundredths of a second
     meet = db.Column(db.String(200))
     date = db.Column(db.Date)
-    season_year = db.Column(db.Integer, index=True)
+    season_year = db.Column(db.Integer)
+
+
+class EventRanking(db.Model):
+    """Denormalized best time per (swimmer, event, season) for ranking reads.
+
+    Maintained per team-season by services.rankings; never written directly.
+    """
+    __tablename__ = "event_ranking"
+    __table_args__ = (
+        # Relay pools: one (team, season, gender, event) range in time order.
+        Index("ix_ranking_team_season", "team_id", "season_year", "gender", "event_id",
+              "time_cs", "swimmer_id", "swimmer_name", "team_name",
+              postgresql_include=["time_id"]),
+        # Individual rankings across team-seasons: one (event, gender) range.
+        Index("ix_ranking_event", "event_id", "gender", "season_year", "time_cs",
+              "team_id", "swimmer_id", "swimmer_name", "team_name",
+              postgresql_include=["time_id"]),
+    )
+
+    time_id = db.Column(db.Integer, db.ForeignKey("time.id"), primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey("team.id"), nullable=False)
+    season_year = db.Column(db.Integer, nullable=False)
+    gender = db.Column(db.String(1))
+    event_id = db.Column(db.Integer, db.ForeignKey("event.id"), nullable=False)
+    swimmer_id = db.Column(db.Integer, db.ForeignKey("swimmer.id"), nullable=False)
+    time_cs = db.Column(db.Integer, nullable=False)
+    team_name = db.Column(db.String(100), nullable=False)
+    swimmer_name = db.Column(db.String(100), nullable=False)
+
+
+class DataVersion(db.Model):
+    """Monotonic change counter per data scope ("ts:<team>:<season>", "events")."""
+    __tablename__ = "data_version"
+
+    scope = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ApiToken(db.Model):
+    """Personal API token. Only a keyed hash of the secret is stored (services.tokens)."""
+    __tablename__ = "api_token"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("app_user.id"), nullable=False, index=True)
+    name = db.Column(db.String(80), nullable=False)
+    prefix = db.Column(db.String(16), nullable=False)                 # shown in the UI
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    scopes = db.Column(db.String(64), nullable=False, default="read")  # comma-separated
+    created_at = db.Column(db.DateTime, nullable=False)
@@ -1,30 +1,36 @@
-# Auth, scrape/seed, and dashboard routes for the main blueprint.
+# Auth, scrape/seed, API-token, and dashboard routes for the main blueprint.
 
 from flask import (
     Blueprint, render_template, request,
-    flash, redirect, url_for, Response,
+    flash, redirect, url_for,
 )
 from flask_login import login_user, logout_user, login_required, current_user
+from flask_wtf import FlaskForm
 
 from extensions import db, login_manager, cache
-from models import User, Team, Swimmer, Event, Time, user_team_seasons
-from forms import LoginForm, RegistrationForm, ScrapeForm, SelectionForm
+from models import User
+from forms import LoginForm, RegistrationForm, ScrapeForm, SelectionForm, ApiTokenForm
 import swimcloud_scraper as sc
 
 from services.scoring import (
-    INDIVIDUAL_EVENTS_ORDER, INDIVIDUAL_EVENTS, RELAYS,
-    build_all_pools, query_individual_event, build_relay_view,
+    INDIVIDUAL_EVENTS_ORDER, RELAYS,
+    build_all_pools, rank_individual_event, build_relay_view,
 )
-from services.export_service import build_excel
-from services.import_service import import_team
+from services.snapshot import load_snapshots
+from services.event_registry import registry
+from services.access import load_principal, team_season_pairs, team_season_label
+from services.export_service import ExportRequest
+from services.export_cache import get_or_build, send_export, export_meta
+from services.import_service import import_team, unlink_team_season
 from services.seed_service import seed_teams
+from services import tokens
 
 main = Blueprint('main', __name__)
 
 
 @login_manager.user_loader
 def load_user(uid):
-    return db.session.get(User, int(uid))
+    return load_principal(int(uid))
 
 
 def _render_select(form, swimmers=None, excluded=None, pagination=None):
@@ -37,22 +43,6 @@ def _render_select(form, swimmers=None, excluded=None, pagination=None):
     )
 
 
-def _team_season_pairs():
-    return (
-        db.session.query(Team.id, Team.name, user_team_seasons.c.season_year)
-        .join(user_team_seasons, Team.id == user_team_seasons.c.team_id)
-        .filter(user_team_seasons.c.user_id == current_user.id)
-        .order_by(user_team_seasons.c.season_year.desc(), Team.name)
-        .all()
-    )
-
-
-def _parse_selected(selected):
-    team_ids = [int(x.split(':')[0]) for x in selected]
-    seasons  = [int(x.split(':')[1]) for x in selected]
-    return team_ids, seasons
-
-
 @main.route('/')
 def index():
     return redirect(url_for('main.login'))
@@ -98,6 +88,32 @@ def seed_test_data():
     return redirect(url_for('main.scrape'))
 
 
+@main.route('/tokens', methods=['GET', 'POST'])
+@login_required
+def api_tokens():
+    form = ApiTokenForm()
+    new_token = None
+    if form.validate_on_submit():
+        scopes = ('read', 'import') if form.allow_import.data else ('read',)
+        _, new_token = tokens.create_token(current_user.id, form.name.data.strip(), scopes)
+        db.session.commit()
+        flash("Token created. Copy it now \u2014 it won't be shown again.", 'success')
+        form = ApiTokenForm(formdata=None)
+    return render_template('tokens.html', form=form, new_token=new_token,
+                           tokens=tokens.user_tokens(current_user.id))
+
+
+@main.route('/tokens/<int:token_id>/revoke', methods=['POST'])
+@login_required
+def revoke_api_token(token_id):
+    if FlaskForm().validate_on_submit() and tokens.revoke_token(current_user.id, token_id):
+        db.session.commit()
+        flash("Token revoked.", 'success')
+    else:
+        flash("Token not found.", 'warning')
+    return redirect(url_for('main.api_tokens'))
+
+
 @main.route('/scrape', methods=['GET', 'POST'])
 @login_required
 def scrape():
@@ -156,9 +172,9 @@ def scrape():
 @login_required
 def select():
     form = SelectionForm()
-    pairs = _team_season_pairs()
+    pairs = team_season_pairs(current_user.id)
     form.teams.choices = [
-        (f"{tid}:{yr}", f"{yr} {tname}") for tid, tname, yr in pairs
+        (f"{tid}:{yr}", team_season_label(tname, yr)) for tid, tname, yr in pairs
     ]
 
     if request.method == 'POST' and 'remove_ts' in request.form:
@@ -169,47 +185,13 @@ def select():
         removed = []
         for ts in selected:
             tid, yr = int(ts.split(':')[0]), int(ts.split(':')[1])
-            team = db.session.get(Team, tid)
-            removed.append(f"{team.name} ({yr})")
-            db.session.execute(
-                user_team_seasons.delete().where(
-                    (user_team_seasons.c.user_id == current_user.id) &
-                    (user_team_seasons.c.team_id == tid) &
-                    (user_team_seasons.c.season_year == yr)
-                )
-            )
-            db.session.flush()
-            other = db.session.execute(
-                user_team_seasons.select().where(
-                    (user_team_seasons.c.team_id == tid) &
-                    (user_team_seasons.c.season_year == yr)
-                )
-            ).first()
-            if not other:
-                swimmer_ids = [s.id for s in Swimmer.query.filter_by(team_id=tid).all()]
-                if swimmer_ids:
-                    Time.query.filter(
-                        Time.swimmer_id.in_(swimmer_ids),
-                        Time.season_year == yr,
-                    ).delete(synchronize_session=False)
-                remaining = (
-                    db.session.query(Time.id)
-                    .join(Time.swimmer)
-                    .filter(Swimmer.team_id == tid)
-                    .first()
-                )
-                if not remaining:
-                    Swimmer.query.filter_by(team_id=tid).delete(synchronize_session=False)
-                    db.session.delete(team)
+            removed.append(unlink_team_season(tid, yr, current_user.id))
         db.session.commit()
         cache.clear()
         flash(f"Removed: {', '.join(removed)}.", "success")
         return redirect(url_for('main.select'))
 
-    event_map = {
-        e.name: str(e.id)
-        for e in Event.query.filter(Event.name.in_(INDIVIDUAL_EVENTS)).all()
-    }
+    event_map = {name: str(eid) for name, eid in registry().ids().items()}
     form.event.choices = (
         [(event_map[n], n) for n in INDIVIDUAL_EVENTS_ORDER if n in event_map]
         + [(key, f"{' '.join(key.split('_')[1:]).title()} Relay") for key in RELAYS]
@@ -248,22 +230,25 @@ def select():
     form.max_relays_per_team.data = raw_rpt
     max_rpt                       = int(raw_rpt) if raw_rpt != '0' else 999
     form.relay_sort.data          = relay_sort = request.form.get('relay_sort', 'speed')
-    team_ids, seasons             = _parse_selected(selected)
     choices_map                   = dict(form.teams.choices)
 
     if 'export_excel' in request.form:
-        data = build_excel(pairs, selected, team_ids, seasons, excluded, top_n, form.teams.choices, gender)
-        return Response(
-            data,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': 'attachment;filename=swim_results.xlsx'},
+        export = ExportRequest(genders=(gender,), top_n=top_n)
+        chosen = [p for p in pairs if f"{p[0]}:{p[2]}" in selected]
+        key, _ = get_or_build(
+            export, chosen, excluded, choices_map,
+            lambda genders: {gender: load_snapshots(pairs, selected, gender)},
         )
+        return send_export(key, export_meta(export, chosen))
+
+    snapshots = load_snapshots(pairs, selected, gender)
 
     if ev not in RELAYS:
-        swimmers = query_individual_event(team_ids, seasons, excluded, int(ev), gender, top_n)
+        ev_name = registry().name_for(int(ev))
+        swimmers = rank_individual_event(snapshots, ev_name, excluded, top_n)
         return _render_select(form, swimmers, excluded)
 
-    pools = build_all_pools(pairs, selected, ev, excluded, gender)
+    pools = build_all_pools(snapshots, ev, excluded)
     try:
         page = int(request.form.get('page', 1))
     except Exception:
@@ -0,0 +1,77 @@
+# Which team-seasons a user may see. Shared by the dashboard and the API.
+# Grants and the login principal are cached per user ("acl:<uid>", "principal:<uid>");
+# link_team_season_to_user and unlink_team_season call invalidate().
+
+from flask_login import UserMixin
+
+from extensions import db, cache
+from models import Team, User, user_team_seasons
+
+
+def _acl_key(user_id):
+    return f"acl:{user_id}"
+
+
+def _principal_key(user_id):
+    return f"principal:{user_id}"
+
+
+class Principal(UserMixin):
+    """The logged-in user as Flask-Login sees it: id and username, no ORM row.
+
+    scopes is None for session logins (everything allowed) and the token's
+    scope set for API-token requests.
+    """
+
+    def __init__(self, id, username, scopes=None):
+        self.id = id
+        self.username = username
+        self.scopes = scopes
+
+
+def load_principal(user_id):
+    """Principal for user_id from the cache, or one User lookup. None if no such user."""
+    cached = cache.get(_principal_key(user_id))
+    if cached is None:
+        row = db.session.execute(
+            db.select(User.id, User.username).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        cached = (row.id, row.username)
+        cache.set(_principal_key(user_id), cached)
+    return Principal(*cached)
+
+
+def team_season_pairs(user_id):
+    """(team_id, team_name, season_year) granted to user_id, newest season first."""
+    pairs = cache.get(_acl_key(user_id))
+    if pairs is None:
+        pairs = [
+            tuple(row) for row in
+            db.session.query(Team.id, Team.name, user_team_seasons.c.season_year)
+            .join(user_team_seasons, Team.id == user_team_seasons.c.team_id)
+            .filter(user_team_seasons.c.user_id == user_id)
+            .order_by(user_team_seasons.c.season_year.desc(), Team.name)
+            .all()
+        ]
+        cache.set(_acl_key(user_id), pairs)
+    return pairs
+
+
+def can_access(user_id, team_id, season_year=None):
+    """True if user_id holds team_id (in season_year, or in any season when None)."""
+    return any(
+        tid == team_id and (season_year is None or yr == season_year)
+        for tid, _, yr in team_season_pairs(user_id)
+    )
+
+
+def invalidate(user_id):
+    """Drop user_id's cached grants and principal after a grant change."""
+    cache.delete_many(_acl_key(user_id), _principal_key(user_id))
+
+
+def team_season_label(team_name, season_year):
+    """Display label used for a team-season across the dashboard, API and export."""
+    return f"{season_year} {team_name}"
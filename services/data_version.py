@@ -0,0 +1,73 @@
+# Monotonic data versions: one per team-season ("ts:<tid>:<yr>"), one per team
+# ("team:<tid>", moved by any of its seasons) and one for the event list.
+# Writers bump inside their transaction; the API derives ETags from the cached versions.
+
+from sqlalchemy import select
+
+from extensions import db, cache, dialect_insert
+from models import DataVersion
+from services.db_routing import hold_replica
+
+EVENTS = "events"
+
+
+def ts_scope(team_id, season_year):
+    return f"ts:{team_id}:{season_year}"
+
+
+def team_scope(team_id):
+    return f"team:{team_id}"
+
+
+def _with_team_scopes(scopes):
+    """scopes plus the team scope of every team-season scope among them."""
+    out = list(dict.fromkeys(scopes))
+    for s in scopes:
+        if s.startswith("ts:"):
+            team = team_scope(s.split(":")[1])
+            if team not in out:
+                out.append(team)
+    return out
+
+
+def _key(scope):
+    return f"dv:{scope}"
+
+
+def bump(*scopes):
+    """Increment each scope's version (creating it at 1). Caller commits.
+
+    A team-season scope also moves its team's scope, for views (rosters,
+    swimmer counts) that span every season of a team.
+
+    Also holds replica reads on the primary for a while (hold_replica), so a
+    snapshot rebuilt after this change is not read from a lagging replica.
+    """
+    scopes = _with_team_scopes(scopes)
+    table = DataVersion.__table__
+    stmt = dialect_insert(table).values([{'scope': s, 'version': 1} for s in scopes])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['scope'], set_={'version': table.c.version + 1},
+    )
+    db.session.execute(stmt)
+    cache.delete_many(*[_key(s) for s in scopes])
+    hold_replica()
+
+
+def versions(scopes):
+    """{scope: version} from the cache, loading any misses in one query (0 if never bumped)."""
+    scopes = list(scopes)
+    found = {
+        s: v for s, v in zip(scopes, cache.get_many(*[_key(s) for s in scopes]))
+        if v is not None
+    }
+    missing = [s for s in scopes if s not in found]
+    if missing:
+        stored = dict(db.session.execute(
+            select(DataVersion.scope, DataVersion.version)
+            .where(DataVersion.scope.in_(missing))
+        ).all())
+        loaded = {s: stored.get(s, 0) for s in missing}
+        cache.set_many({_key(s): v for s, v in loaded.items()})
+        found.update(loaded)
+    return found
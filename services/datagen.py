@@ -0,0 +1,241 @@
+# Seeded large-scale synthetic data: many teams over many seasons, coaches with
+# overlapping team-season grants. Library (generate) and CLI (flask generate-data).
+# Rows are built in Python with pre-assigned ids and written with batched core
+# executemany inserts, so millions of Time rows load without per-row round trips.
+# Pending rows are flushed every batch_size times, so memory stays bounded.
+
+import datetime
+import random
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+
+from extensions import db, cache
+from models import Team, Swimmer, Time, User, user_team_seasons
+from services.import_service import get_or_create_event
+from services.rankings import refresh_teams
+from services.scoring import secs_to_cs
+from services.seed_service import _BASE_TIMES, _MALE_FIRST, _FEMALE_FIRST, _LAST, _MEETS
+from services import data_version
+
+BATCH_SIZE = 20_000
+FEMALE_FACTOR = 1.07
+COACH_PASSWORD = "Coachpass1"
+
+_PLACES = [
+    'Allegheny', 'Bayview', 'Cedar Falls', 'Clearwater', 'Eastbrook', 'Fairmont',
+    'Glenwood', 'Harbor City', 'Highland', 'Kingsport', 'Lakeshore', 'Maple Ridge',
+    'Northgate', 'Oak Valley', 'Pinecrest', 'Redwood', 'Riverside', 'Rockport',
+    'Silver Lake', 'Springfield', 'Stonebridge', 'Summit', 'Westfield', 'Willow Creek',
+]
+_MASCOTS = [
+    'Aquanauts', 'Barracudas', 'Dolphins', 'Eagles', 'Falcons', 'Hawks', 'Hurricanes',
+    'Marlins', 'Orcas', 'Otters', 'Pirates', 'Rays', 'Sharks', 'Stingrays', 'Tritons',
+    'Waves', 'Wolves', 'Thunder', 'Titans', 'Tide',
+]
+_STROKES = ('Free', 'Back', 'Breast', 'Fly', 'IM')
+
+
+def _event_profile(name):
+    """(stroke, distance class) for an event name: -1 sprint, 0 middle, 1 distance."""
+    dist, stroke = name.split(' ', 1)
+    dist = int(dist)
+    return stroke, (-1 if dist <= 100 else 0 if dist <= 200 else 1)
+
+
+@dataclass
+class GenerateStats:
+    teams: int = 0
+    swimmers: int = 0
+    times: int = 0
+    users: int = 0
+    grants: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.times / self.seconds if self.seconds else 0.0
+
+
+class _Swimmer:
+    """Latent profile shared by every event and season, so times correlate."""
+
+    __slots__ = ('id', 'gender', 'name', 'entry', 'ability', 'affinity', 'distance', 'events')
+
+    def __init__(self, rng, sid, gender, name, entry, team_strength, event_names):
+        self.id, self.gender, self.name, self.entry = sid, gender, name, entry
+        self.ability = team_strength + rng.gauss(0, 1)
+        specialty = rng.choice(_STROKES)
+        self.affinity = {s: rng.gauss(0.8 if s == specialty else 0, 0.5) for s in _STROKES}
+        self.distance = rng.gauss(0, 1)              # <0 sprinter, >0 distance swimmer
+        fit = {
+            ev: self.affinity[stroke] - abs(self.distance - dist) + rng.gauss(0, 0.4)
+            for ev, (stroke, dist) in event_names.items()
+        }
+        self.events = sorted(fit, key=fit.get, reverse=True)[:rng.randint(4, 8)]
+
+
+def _swim_cs(rng, swimmer, ev_name, profile, class_year):
+    lo, hi = _BASE_TIMES[ev_name]
+    if swimmer.gender == 'F':
+        lo, hi = lo * FEMALE_FACTOR, hi * FEMALE_FACTOR
+    stroke, dist = profile
+    skill = swimmer.ability + 0.6 * swimmer.affinity[stroke] - 0.3 * abs(swimmer.distance - dist)
+    frac = min(max(0.5 - 0.18 * skill + rng.gauss(0, 0.04), 0.0), 1.0)
+    progression = 1 - 0.012 * (class_year - 1) + rng.gauss(0, 0.004)
+    return secs_to_cs((lo + (hi - lo) * frac) * progression)
+
+
+def _next_id(column):
+    return (db.session.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _insert(table, rows, batch_size):
+    conn = db.session.connection()
+    for i in range(0, len(rows), batch_size):
+        conn.execute(table.insert(), rows[i:i + batch_size])
+
+
+def _sync_sequences(tables):
+    """Explicit ids leave PostgreSQL serial sequences behind; move them past max(id)."""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for table in tables:
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM \"{table}\"))"
+        ))
+
+
+def _team_names(rng, count, taken):
+    combos = [f"{p} {m}" for p in _PLACES for m in _MASCOTS]
+    rng.shuffle(combos)
+    names, n = [], 0
+    while len(names) < count:
+        base = combos[n % len(combos)]
+        suffix = n // len(combos)
+        name = f"{base} {suffix + 1}" if suffix else base
+        if name not in taken:
+            names.append(name)
+            taken.add(name)
+        n += 1
+    return names
+
+
+def generate(teams=10, swimmers=30, seasons=1, users=0, seed=0, last_season=2025,
+             rivals=3, grant_user_id=None, batch_size=BATCH_SIZE):
+    """Insert a deterministic league and return GenerateStats.
+
+    teams x seasons team-seasons with rosters of `swimmers` per season (half
+    men, half women). Swimmers stay four seasons, improving each year, and
+    seniors are replaced by freshmen. Each of `users` coaches ("coach001",
+    password COACH_PASSWORD) sees every season of a home team plus `rivals`
+    other teams' recent seasons, so grants overlap. grant_user_id, if given,
+    is granted every generated team-season. Commits.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    stats = GenerateStats()
+    years = list(range(last_season - seasons + 1, last_season + 1))
+    event_ids = {name: get_or_create_event(name).id for name in _BASE_TIMES}
+    profiles = {name: _event_profile(name) for name in _BASE_TIMES}
+
+    team_id = _next_id(Team.id)
+    swimmer_id = _next_id(Swimmer.id)
+    taken = set(db.session.execute(select(Team.name)).scalars())
+    team_ids = []
+    team_rows, swimmer_rows, time_rows = [], [], []
+
+    def flush():
+        """Write pending rows parents-first and drop them from memory."""
+        _insert(Team.__table__, team_rows, batch_size)
+        _insert(Swimmer.__table__, swimmer_rows, batch_size)
+        _insert(Time.__table__, time_rows, batch_size)
+        stats.teams += len(team_rows)
+        stats.swimmers += len(swimmer_rows)
+        stats.times += len(time_rows)
+        team_rows.clear()
+        swimmer_rows.clear()
+        time_rows.clear()
+
+    for name in _team_names(rng, teams, taken):
+        tid, team_id = team_id, team_id + 1
+        team_ids.append(tid)
+        team_rows.append({'id': tid, 'name': name})
+        strength = rng.gauss(0, 0.5)
+        used_names = set()
+
+        def recruit(gender, entry):
+            nonlocal swimmer_id
+            firsts = _MALE_FIRST if gender == 'M' else _FEMALE_FIRST
+            sname = f"{rng.choice(firsts)} {rng.choice(_LAST)}"
+            while sname in used_names:
+                sname = f"{rng.choice(firsts)} {rng.choice(_LAST)}"
+            used_names.add(sname)
+            s = _Swimmer(rng, swimmer_id, gender, sname, entry, strength, profiles)
+            swimmer_id += 1
+            swimmer_rows.append({'id': s.id, 'name': sname, 'gender': gender, 'team_id': tid})
+            return s
+
+        per_gender = max(swimmers // 2, 1)
+        roster = [
+            recruit(g, years[0] - (i % 4))          # class years 1-4 in the first season
+            for g in ('M', 'F') for i in range(per_gender)
+        ]
+        for year in years:
+            if year != years[0]:
+                for i, s in enumerate(roster):
+                    if year - s.entry >= 4:         # graduated
+                        roster[i] = recruit(s.gender, year)
+            meet_date = datetime.date(year - 1, 11, 1 + rng.randrange(28))
+            for s in roster:
+                class_year = year - s.entry + 1
+                for ev in s.events:
+                    time_rows.append({
+                        'swimmer_id': s.id,
+                        'event_id': event_ids[ev],
+                        'time_cs': _swim_cs(rng, s, ev, profiles[ev], class_year),
+                        'meet': rng.choice(_MEETS),
+                        'date': meet_date,
+                        'season_year': year,
+                    })
+            if len(time_rows) >= batch_size:
+                flush()
+    flush()
+
+    grants = set()
+    user_rows = []
+    if users:
+        pw_hash = generate_password_hash(COACH_PASSWORD)     # one scrypt for every coach
+        user_id = _next_id(User.id)
+        existing_users = set(db.session.execute(select(User.username)).scalars())
+        recent = years[-min(len(years), 2):]
+        for n in range(users):
+            username = f"coach{n + 1:03d}"
+            while username in existing_users:
+                username += "x"
+            uid, user_id = user_id, user_id + 1
+            user_rows.append({'id': uid, 'username': username, 'password_hash': pw_hash})
+            home = team_ids[n % len(team_ids)]
+            grants.update((uid, home, yr) for yr in years)
+            for rival in rng.sample(team_ids, min(rivals, len(team_ids))):
+                grants.update((uid, rival, yr) for yr in recent)
+        _insert(User.__table__, user_rows, batch_size)
+    if grant_user_id is not None:
+        grants.update((grant_user_id, tid, yr) for tid in team_ids for yr in years)
+    _insert(user_team_seasons, [
+        {'user_id': u, 'team_id': t, 'season_year': y} for u, t, y in sorted(grants)
+    ], batch_size)
+
+    _sync_sequences(['team', 'swimmer', 'app_user'])
+    if team_ids:
+        refresh_teams(team_ids)
+        data_version.bump(*[data_version.ts_scope(tid, yr) for tid in team_ids for yr in years])
+    db.session.commit()
+    cache.clear()
+
+    stats.users, stats.grants = len(user_rows), len(grants)
+    stats.seconds = time.perf_counter() - started
+    return stats
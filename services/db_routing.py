@@ -0,0 +1,188 @@
+# Engine setup and read/write routing for db.session.
+# SQLite file databases get the production profile: WAL and tuned pragmas on every
+# connection, one writer connection per process, and a separate pool of query_only
+# reader connections that plain SELECTs use until the transaction first writes.
+# Server databases get a sized, pre-pinged pool; with DATABASE_REPLICA_URL set, reads
+# inside read_only() scopes (rankings, snapshots, /api/results, exports) go to the replica,
+# except for REPLICA_MAX_LAG seconds after any data-version bump, so results cached in
+# that window never predate the write.
+
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
+
+READER = 'reader'
+REPLICA = 'replica'
+
+_HOLD_KEY = 'replica:hold_until'
+_SELECT = re.compile(r'\s*(SELECT|WITH)\b', re.IGNORECASE)
+_read_only = ContextVar('read_only', default=False)
+
+
+def is_sqlite_file(uri):
+    url = make_url(uri)
+    return (url.get_backend_name() == 'sqlite'
+            and url.database not in (None, '', ':memory:')
+            and not url.database.startswith('file::memory:'))
+
+
+def is_read(clause):
+    """True for statements a read-only connection can run (SELECT without FOR UPDATE)."""
+    if isinstance(clause, TextClause):
+        return _SELECT.match(clause.text) is not None
+    return bool(getattr(clause, 'is_select', False)) and getattr(clause, '_for_update_arg', None) is None
+
+
+def engines():
+    """{name: engine} of the current app's extra engines (READER, REPLICA), beside db.engines."""
+    return current_app.extensions.get('db_routing', {})
+
+
+def hold_replica():
+    """Keep read_only() reads on the primary for REPLICA_MAX_LAG seconds.
+
+    Called by data_version.bump; the deadline lives in the shared cache
+    backend (under its own prefix, so cache.clear() keeps it) and every
+    worker honours it.
+    """
+    if REPLICA not in engines():
+        return
+    from extensions import replica_hold_cache
+
+    lag = current_app.config['REPLICA_MAX_LAG']
+    replica_hold_cache.set(_HOLD_KEY, time.time() + lag, timeout=int(lag) + 1)
+
+
+def replica_ready():
+    """False while a recent write may not have reached the replica yet."""
+    if REPLICA not in engines():
+        return False
+    from extensions import replica_hold_cache
+
+    until = replica_hold_cache.get(_HOLD_KEY)
+    return until is None or time.time() >= until
+
+
+@contextmanager
+def read_only():
+    """Reads in this block may use the replica (and see slightly stale data).
+
+    Also usable as a decorator: @read_only().
+    """
+    token = _read_only.set(replica_ready())
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+class RoutingSession(Session):
+    """Sends reads to the REPLICA inside read_only() and otherwise to the READER pool,
+    when those are configured; everything else goes to the default engine (primary).
+    Once a transaction writes (or flushes) it stays on the primary, so it reads its
+    own changes."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        routed = engines() if bind is None else None
+        if routed:
+            if self._flushing or not is_read(clause):
+                self.info['writer'] = True
+            elif not self.info.get('writer'):
+                if REPLICA in routed and _read_only.get():
+                    return routed[REPLICA]
+                if READER in routed:
+                    return routed[READER]
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _unpin(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('writer', None)
+
+
+# ─── SQLite profile ──────────────────────────────────────────────────────────
+
+def sqlite_pragmas(config, read_only=False):
+    """PRAGMA statements run on every new connection."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        "PRAGMA journal_mode = WAL",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE_MB']) * 1024 * 1024}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    return pragmas
+
+
+def _on_connect(pragmas):
+    def run(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return run
+
+
+# ─── Server databases ────────────────────────────────────────────────────────
+
+def pool_options(config):
+    """QueuePool settings for PostgreSQL (and other server) engines."""
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def _replica_engine(app):
+    url = app.config['DATABASE_REPLICA_URL']
+    if is_sqlite_file(url):                   # local stand-in, e.g. in tests
+        engine = create_engine(url)
+        event.listen(engine, 'connect', _on_connect(sqlite_pragmas(app.config, read_only=True)))
+        return engine
+    return create_engine(url, **pool_options(app.config))
+
+
+def init_app(app):
+    """Configure engines from app.config, then db.init_app (use instead of calling it directly)."""
+    from extensions import db
+
+    routed = app.extensions['db_routing'] = {}
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if make_url(uri).get_backend_name() != 'sqlite':
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **pool_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+        }
+    if app.config.get('DATABASE_REPLICA_URL'):
+        from extensions import replica_hold_cache
+
+        routed[REPLICA] = _replica_engine(app)
+        replica_hold_cache.init_app(app)
+    profile = app.config.get('SQLITE_PROFILE') and is_sqlite_file(uri)
+    if profile:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+            'pool_size': 1, 'max_overflow': 0,
+            'pool_timeout': app.config['SQLITE_WRITE_TIMEOUT'],
+        }
+    db.init_app(app)
+    if profile:
+        with app.app_context():
+            writer = db.engine
+        event.listen(writer, 'connect', _on_connect(sqlite_pragmas(app.config)))
+        reader = routed[READER] = create_engine(
+            writer.url, pool_size=app.config['SQLITE_READ_POOL_SIZE'], max_overflow=0,
+        )
+        event.listen(reader, 'connect', _on_connect(sqlite_pragmas(app.config, read_only=True)))
@@ -0,0 +1,54 @@
+# In-memory SCY event registry (name <-> id), one per app process.
+# Events are global and only ever added. Creating one bumps the shared "events"
+# data version, so ids() reloads in every worker, not just the one that imported.
+
+from flask import current_app, g
+
+from models import Event
+from services import data_version
+
+
+def _events_version():
+    """The shared events version, read at most once per app context."""
+    if '_events_version' not in g:
+        g._events_version = data_version.versions([data_version.EVENTS])[data_version.EVENTS]
+    return g._events_version
+
+
+class EventRegistry:
+    def __init__(self):
+        self._ids = {}
+        self._names = {}
+        self._version = None
+
+    def load(self):
+        g.pop('_events_version', None)
+        version = _events_version()
+        events = Event.query.filter_by(course='Y').all()
+        self._ids = {e.name: e.id for e in events}
+        self._names = {e.id: e.name for e in events}
+        self._version = version
+
+    def clear(self):
+        self._ids, self._names, self._version = {}, {}, None
+
+    def ids(self):
+        """{name: id} for every SCY event, reloaded when the events version moves."""
+        if not self._ids or _events_version() != self._version:
+            self.load()
+        return self._ids
+
+    def id_for(self, name):
+        if name not in self._ids:
+            self.load()
+        return self._ids.get(name)
+
+    def name_for(self, event_id):
+        if event_id not in self._names:
+            self.load()
+        return self._names.get(event_id)
+
+
+def registry():
+    """The current app's EventRegistry, created on first use."""
+    return current_app.extensions.setdefault('event_registry', EventRegistry())
@@ -0,0 +1,259 @@
+# Content-addressed export cache: finished export files on disk, keyed by a hash of
+# everything that determines their bytes (data versions, selection, sheets, format).
+# Bounded by total size with least-recently-used eviction; big exports build on a
+# background thread and are fetched later by key. Job state lives beside the files
+# as <key>.status markers, so any worker sharing the directory can report it.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, send_file
+
+from services import data_version
+from services.export_service import FORMATS, export_file
+
+KEY_VERSION = 1          # bump when export output changes for the same inputs
+PENDING_TTL = 3600       # seconds before a 'pending' marker is presumed orphaned
+
+
+def export_key(request, selected, excluded, choices_map):
+    """sha256 of the export's inputs. Changes whenever any selected team-season's data does."""
+    scopes = [data_version.EVENTS] + [
+        data_version.ts_scope(tid, yr) for tid, _, yr in selected
+    ]
+    basis = {
+        'v': KEY_VERSION,
+        'versions': data_version.versions(scopes),
+        'labels': {f"{tid}:{yr}": choices_map.get(f"{tid}:{yr}") for tid, _, yr in selected},
+        'specs': request.specs(),
+        'format': request.format,
+        'top_n': request.top_n,
+        'excluded': sorted(excluded),
+    }
+    return hashlib.sha256(json.dumps(basis, sort_keys=True).encode()).hexdigest()
+
+
+def _write_json(path, obj):
+    """Write obj as JSON to path atomically (temp file in the same directory + rename)."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ExportCache:
+    """Files <key> plus <key>.json metadata in one directory, capped at max_bytes.
+
+    <key>.status holds a background job's state ({'status': 'pending'|'failed',
+    'meta', 'error', 'at'}) until the file is published.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Metadata for a cached export (marking it recently used), or None."""
+        meta = _read_json(self.path(key) + '.json')
+        if meta is None:
+            return None
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            return None
+        return meta
+
+    def put(self, key, fileobj, meta):
+        """Store fileobj under key (atomically), then evict down to max_bytes."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as out:
+            while chunk := fileobj.read(1 << 16):
+                out.write(chunk)
+        os.replace(tmp, self.path(key))
+        _write_json(self.path(key) + '.json', meta)
+        self.clear_status(key)
+        self.evict()
+
+    def set_status(self, key, status, meta, error=None):
+        _write_json(self.path(key) + '.status',
+                    {'status': status, 'meta': meta, 'error': error, 'at': time.time()})
+
+    def status(self, key):
+        """The job marker for key, or None (no job, or a pending one gone stale)."""
+        marker = _read_json(self.path(key) + '.status')
+        if marker is None:
+            return None
+        if marker['status'] == 'pending' and time.time() - marker['at'] > PENDING_TTL:
+            return None
+        return marker
+
+    def clear_status(self, key):
+        try:
+            os.remove(self.path(key) + '.status')
+        except OSError:
+            pass
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.startswith('.') or name.endswith(('.json', '.status')):
+                    continue
+                try:
+                    st = os.stat(self.path(name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for path in (self.path(name), self.path(name) + '.json'):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+
+
+def export_cache():
+    """The current app's ExportCache, created on first use."""
+    ext = current_app.extensions
+    if 'export_cache' not in ext:
+        ext['export_cache'] = ExportCache(
+            current_app.config['EXPORT_CACHE_DIR'],
+            current_app.config.get('EXPORT_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+        )
+    return ext['export_cache']
+
+
+def export_meta(request, selected, filename='swim_results'):
+    mimetype, ext = FORMATS[request.format]
+    return {
+        'mimetype': mimetype,
+        'filename': f"{filename}.{ext}",
+        'team_seasons': [[tid, yr] for tid, _, yr in selected],
+    }
+
+
+def send_export(key, meta):
+    """The cached file as a download; ETag is the key, so If-None-Match yields 304."""
+    return send_file(
+        export_cache().path(key),
+        mimetype=meta['mimetype'],
+        as_attachment=True,
+        download_name=meta['filename'],
+        etag=key,
+        conditional=True,
+        max_age=0,
+    )
+
+
+def get_or_build(request, selected, excluded, choices_map, load_snapshots, background=False):
+    """(key, ready) for an export, building it unless the cache already has it.
+
+    load_snapshots(genders) -> {gender: {'tid:yr': snapshot}} only runs on a
+    miss. With background=True the build is queued and ready is False; fetch
+    the key later.
+    """
+    key = export_key(request, selected, excluded, choices_map)
+    if export_cache().get(key) is not None:
+        return key, True
+
+    config = current_app.config
+    snapshots = load_snapshots(request.genders)
+
+    def build():
+        return export_file(
+            request, snapshots, excluded, choices_map,
+            workers=config.get('EXPORT_WORKERS', 4),
+            executor=config.get('EXPORT_EXECUTOR', 'thread'),
+        )
+
+    meta = export_meta(request, selected)
+    if background:
+        submit(key, build, meta)
+        return key, False
+    fileobj = build()
+    try:
+        export_cache().put(key, fileobj, meta)
+    finally:
+        fileobj.close()
+    return key, True
+
+
+# ─── Background jobs ─────────────────────────────────────────────────────────
+
+_jobs = {}                 # key -> Future, for exports built in this process
+_jobs_lock = threading.Lock()
+_executor = None
+
+
+def _job_executor(workers):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+    return _executor
+
+
+def submit(key, build, meta):
+    """Run build() -> open file on a background thread and cache the result under key.
+
+    A key already being built, by this or any process sharing the cache
+    directory, is not submitted twice.
+    """
+    app = current_app._get_current_object()
+    cache = export_cache()
+
+    def run():
+        with app.app_context():
+            try:
+                fileobj = build()
+                try:
+                    cache.put(key, fileobj, meta)
+                finally:
+                    fileobj.close()
+            except Exception as e:
+                cache.set_status(key, 'failed', meta, str(e))
+                raise
+
+    with _jobs_lock:
+        for done in [k for k, f in _jobs.items() if f.done()]:
+            del _jobs[done]                 # the cache or its marker has the outcome
+        marker = cache.status(key)
+        if key in _jobs or (marker is not None and marker['status'] == 'pending'):
+            return
+        cache.set_status(key, 'pending', meta)
+        _jobs[key] = _job_executor(app.config.get('EXPORT_JOB_WORKERS', 2)).submit(run)
+
+
+def job_status(key):
+    """(state, meta) for key's background job: state is 'pending' or 'failed: <error>'.
+
+    Read from the shared cache directory, so it answers for jobs started by
+    any worker. None when there is no such job.
+    """
+    marker = export_cache().status(key)
+    if marker is None:
+        return None
+    if marker['status'] == 'failed':
+        return f"failed: {marker['error']}", marker['meta']
+    return marker['status'], marker['meta']
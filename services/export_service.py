@@ -1,114 +1,259 @@
-# Excel export: per-event and relay sheets for the swim scoring dashboard.
+# Exports: per-event and relay sheets for the swim scoring dashboard and API.
+# Sheets are computed independently on a worker pool, then one writer assembles
+# an xlsx (openpyxl write-only), a zip of CSVs, or a zip of Parquet files.
+# openpyxl and pyarrow are imported by their writers, on the first export.
 
-from io import BytesIO
+import csv
+import io
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass
 
-import pandas as pd
-from openpyxl.utils import get_column_letter
-
-from extensions import db
-from models import Team, Swimmer, Event, Time
+from services.event_registry import registry
+from services.tracing import span
 from services.scoring import (
-    INDIV_SCORE, RELAY_SCORE, INDIVIDUAL_EVENTS_ORDER, RELAYS,
+    RELAY_SCORE, INDIVIDUAL_EVENTS_ORDER, RELAYS,
     format_time, score_for,
-    build_all_pools, pick_greedy_squads, pick_scored_combos,
+    build_all_pools, rank_individual_event, pick_greedy_squads, pick_scored_combos,
     rank_scored_combos, _attach_team_info,
 )
 
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FORMATS = {
+    'xlsx':    (XLSX_MIMETYPE, 'xlsx'),
+    'csv':     ('application/zip', 'zip'),
+    'parquet': ('application/zip', 'zip'),
+}
+GENDER_LABELS = {'M': 'Men', 'F': 'Women'}
+RELAY_MODES = ('unscored', 'scored')
+
+INDIVIDUAL_HEADER = ('Team/Season', 'Swimmer', 'Time', 'Points')
+RELAY_HEADER = ('Relay #', 'Type', 'Team/Season', 'Swimmer', 'Stroke', 'Split', 'Relay Time')
+
+
+@dataclass(frozen=True)
+class ExportRequest:
+    """What to export. Empty sheets means every sheet.
+
+    sheets holds individual event names ("100 Fly"), relay keys
+    ("relay_medley", both modes) or "relay_key:unscored" / "relay_key:scored".
+    """
+    sheets: tuple = ()
+    genders: tuple = ('M',)
+    format: str = 'xlsx'
+    top_n: int = 16
+
+    def __post_init__(self):
+        if self.format not in FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+        if not self.genders or set(self.genders) - set(GENDER_LABELS):
+            raise ValueError("genders must be a non-empty subset of M, F")
+        for sheet in self.sheets:
+            _parse_sheet(sheet)
+
+    def specs(self):
+        """(gender, kind, key, mode) per sheet, in workbook order."""
+        chosen = [_parse_sheet(s) for s in self.sheets] or _all_sheets()
+        order = {spec: i for i, spec in enumerate(_all_sheets())}
+        chosen = sorted(set(chosen), key=order.__getitem__)
+        return [(g, *spec) for g in self.genders for spec in chosen]
+
+
+def _all_sheets():
+    return ([('event', ev, None) for ev in INDIVIDUAL_EVENTS_ORDER]
+            + [('relay', key, mode) for key in RELAYS for mode in RELAY_MODES])
+
+
+def _parse_sheet(sheet):
+    key, _, mode = sheet.partition(':')
+    if key in INDIVIDUAL_EVENTS_ORDER and not mode:
+        return ('event', key, None)
+    if key in RELAYS and mode in RELAY_MODES:
+        return ('relay', key, mode)
+    if key in RELAYS and not mode:
+        raise ValueError(f"Use {key}:unscored or {key}:scored")
+    raise ValueError(f"Unknown sheet: {sheet}")
+
+
+def _expand(sheets):
+    """Relay keys without a mode stand for both modes."""
+    out = []
+    for sheet in sheets:
+        if sheet in RELAYS:
+            out.extend(f"{sheet}:{mode}" for mode in RELAY_MODES)
+        else:
+            out.append(sheet)
+    return tuple(out)
 
-def _squads_to_excel_rows(squads, score_table=None):
-    rows = []
+
+def export_request(sheets=(), genders=('M',), format='xlsx', top_n=16):
+    """ExportRequest from loosely-typed input (bare relay keys allowed). Raises ValueError."""
+    return ExportRequest(_expand(sheets), tuple(genders), format, int(top_n))
+
+
+# ─── Sheet computation (pure; runs on the worker pool) ───────────────────────
+
+def _individual_rows(ranked):
+    for row in ranked:
+        yield (f"{row['team']} ({row['season']})", row['name'], row['time_fmt'], row['points'])
+
+
+def _squad_rows(squads, score_table=None):
     for display_pos, squad in enumerate(squads, start=1):
         scoring_rank = squad.get('rank', display_pos)
         pts = score_for(score_table, scoring_rank) if score_table else 0
         for leg in squad['leg']:
-            row = {
-                'Relay #':     display_pos,
-                'Type':        squad.get('type', ''),
-                'Team/Season': squad['team'],
-                'Swimmer':     leg['name'],
-                'Stroke':      leg.get('stroke', 'Free'),
-                'Split':       format_time(leg['time']),
-                'Relay Time':  format_time(squad['time']),
-            }
-            if score_table is not None:
-                row['Points'] = pts
-            rows.append(row)
-    return rows
-
-
-def _write_sheet(writer, name, df):
-    name = name[:31]
-    df.to_excel(writer, sheet_name=name, index=False)
-    if df.empty:
-        return
-    ws = writer.sheets[name]
-    for ci, col in enumerate(df.columns):
-        w = max(df[col].astype(str).map(len).max(), len(col)) + 2
-        ws.column_dimensions[get_column_letter(ci + 1)].width = w
-
-
-def build_excel(pairs, selected, team_ids, seasons, excluded, top_n, team_choices, gender):
-    choices_map = dict(team_choices)
-    output = BytesIO()
-
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        for ev_name in INDIVIDUAL_EVENTS_ORDER:
-            ev_obj = Event.query.filter_by(name=ev_name, course='Y').first()
-            if not ev_obj:
-                continue
-            rows = (
-                db.session.query(
-                    Time, Swimmer.name.label('swimmer'),
-                    Team.name.label('team'), Time.season_year.label('season'),
-                )
-                .join(Time.swimmer).join(Swimmer.team)
-                .filter(
-                    Team.id.in_(team_ids), Swimmer.gender == gender,
-                    Time.event_id == ev_obj.id,
-                    Time.season_year.in_(seasons), ~Time.id.in_(excluded),
-                )
-                .order_by(Time.time_secs)
-                .all()
+            row = (
+                display_pos,
+                squad.get('type', ''),
+                squad['team'],
+                leg['name'],
+                leg.get('stroke', 'Free'),
+                format_time(leg['time']),
+                format_time(squad['time']),
             )
-            seen_ts = set()
-            distinct_rows = []
-            for t, swimmer, team, season in rows:
-                key = (swimmer, team, season)
-                if key not in seen_ts:
-                    seen_ts.add(key)
-                    distinct_rows.append((t, swimmer, team, season))
-            data = [
-                {
-                    'Team/Season': f"{team} ({season})",
-                    'Swimmer':     swimmer,
-                    'Time':        format_time(t.time_secs),
-                    'Points':      score_for(INDIV_SCORE, i),
-                }
-                for i, (t, swimmer, team, season) in enumerate(distinct_rows, start=1)
-            ]
-            _write_sheet(writer, ev_name, pd.DataFrame(data))
-
-        for relay_key in RELAYS:
-            pools = build_all_pools(pairs, selected, relay_key, excluded, gender)
-            label = relay_key.split('_', 1)[1].title()
-
-            all_squads = []
-            for key, pool in pools.items():
-                squads = pick_greedy_squads(pool, relay_key, top_n)
-                _attach_team_info(squads, key, choices_map)
-                all_squads.extend(squads)
-            all_squads.sort(key=lambda x: x['time'])
-            _write_sheet(writer, f"{label} Unscored",
-                         pd.DataFrame(_squads_to_excel_rows(all_squads)))
-
-            all_combos = []
-            for key, pool in pools.items():
-                combos = pick_scored_combos(pool, relay_key, 2)
-                _attach_team_info(combos, key, choices_map)
-                all_combos.extend(combos)
-            ranked = rank_scored_combos(all_combos)
-            _write_sheet(writer, f"{label} Scored",
-                         pd.DataFrame(_squads_to_excel_rows(ranked, RELAY_SCORE)))
-
-    output.seek(0)
-    return output.getvalue()
+            if score_table is not None:
+                row += (pts,)
+            yield row
+
+
+def _sheet_name(gender, kind, key, mode, genders):
+    if kind == 'event':
+        name = key
+    else:
+        name = f"{key.split('_', 1)[1].title()} {mode.title()}"
+    if len(genders) > 1:
+        name = f"{GENDER_LABELS[gender]} {name}"
+    return name[:31]
+
+
+def compute_sheet(spec, snapshots, excluded, top_n, choices_map, genders=('M',)):
+    """(name, header, rows) for one (gender, kind, key, mode) spec over {'tid:yr': snapshot}."""
+    gender, kind, key, mode = spec
+    name = _sheet_name(gender, kind, key, mode, genders)
+    if kind == 'event':
+        ranked = rank_individual_event(snapshots, key, excluded)
+        return name, INDIVIDUAL_HEADER, list(_individual_rows(ranked))
+
+    pools = build_all_pools(snapshots, key, excluded)
+    squads = []
+    if mode == 'unscored':
+        for ts, pool in pools.items():
+            picked = pick_greedy_squads(pool, key, top_n)
+            _attach_team_info(picked, ts, choices_map)
+            squads.extend(picked)
+        squads.sort(key=lambda x: x['time'])
+        return name, RELAY_HEADER, list(_squad_rows(squads))
+
+    for ts, pool in pools.items():
+        combos = pick_scored_combos(pool, key, 2)
+        _attach_team_info(combos, ts, choices_map)
+        squads.extend(combos)
+    ranked = rank_scored_combos(squads)
+    return name, RELAY_HEADER + ('Points',), list(_squad_rows(ranked, RELAY_SCORE))
+
+
+def _compute_star(args):
+    gender, _, key, mode = args[0]
+    with span('export.sheet', gender=gender, sheet=f"{key}:{mode}" if mode else key):
+        return compute_sheet(*args)
+
+
+def compute_sheets(request, snapshots_by_gender, excluded, choices_map,
+                   workers=4, executor='thread'):
+    """Every requested sheet, computed on a thread or process pool, in workbook order.
+
+    Events absent from the database are skipped. snapshots_by_gender is
+    {gender: {'tid:yr': snapshot}}; sheets only read it.
+    """
+    events = registry()
+    specs = [
+        spec for spec in request.specs()
+        if spec[1] != 'event' or events.id_for(spec[2]) is not None
+    ]
+    jobs = [
+        (spec, snapshots_by_gender[spec[0]], excluded, request.top_n, choices_map, request.genders)
+        for spec in specs
+    ]
+    if workers <= 1 or len(jobs) <= 1:
+        return [_compute_star(job) for job in jobs]
+    if executor == 'process':
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            return list(pool.map(_compute_star, jobs))
+    # Each thread runs in a copy of the caller's context so sheet spans join the request trace.
+    contexts = [copy_context() for _ in jobs]
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(lambda ctx, job: ctx.run(_compute_star, job), contexts, jobs))
+
+
+# ─── Writers (single-threaded; one per format) ───────────────────────────────
+
+def _write_xlsx_sheet(wb, name, header, rows):
+    """Append one sheet, sizing columns to the widest value.
+
+    Write-only sheets need column widths before the first row; the rows are
+    already computed, so widths are measured first.
+    """
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(title=name)
+    widths = [len(h) for h in header]
+    for row in rows:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(str(value)))
+    for i, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width + 2
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+
+
+def write_xlsx(fileobj, sheets):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name, header, rows in sheets:
+        _write_xlsx_sheet(wb, name, header, rows)
+    wb.save(fileobj)
+
+
+def write_csv_zip(fileobj, sheets):
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, header, rows in sheets:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(header)
+            writer.writerows(rows)
+            zf.writestr(f"{name}.csv", buf.getvalue())
+
+
+def write_parquet_zip(fileobj, sheets):
+    import pyarrow
+    import pyarrow.parquet as pq
+
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_STORED) as zf:
+        for name, header, rows in sheets:
+            columns = list(zip(*rows)) if rows else [[] for _ in header]
+            table = pyarrow.table({h: list(col) for h, col in zip(header, columns)})
+            buf = io.BytesIO()
+            pq.write_table(table, buf)
+            zf.writestr(f"{name}.parquet", buf.getvalue())
+
+
+WRITERS = {'xlsx': write_xlsx, 'csv': write_csv_zip, 'parquet': write_parquet_zip}
+
+
+def export_file(request, snapshots_by_gender, excluded, choices_map, workers=4, executor='thread'):
+    """The finished export in an anonymous temp file, rewound and ready to stream."""
+    sheets = compute_sheets(request, snapshots_by_gender, excluded, choices_map, workers, executor)
+    tmp = tempfile.TemporaryFile()
+    try:
+        with span('export.write', format=request.format):
+            WRITERS[request.format](tmp, sheets)
+    except Exception:
+        tmp.close()
+        raise
+    tmp.seek(0)
+    return tmp
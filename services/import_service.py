@@ -4,12 +4,21 @@
 import logging
 from dataclasses import dataclass
 
-from extensions import db, cache
+from sqlalchemy import select, update
+
+from extensions import db, cache, dialect_insert
 from models import Team, Swimmer, Event, Time, user_team_seasons
 import swimcloud_scraper as sc
+from services.scoring import secs_to_cs
+from services.rankings import refresh_team_season, drop_team_season
+from services.event_registry import registry
+from services import access, data_version
 
 log = logging.getLogger(__name__)
 
+# Rows per multi-VALUES upsert; keeps bound parameters well under SQLite's limit.
+UPSERT_BATCH = 500
+
 
 @dataclass
 class ImportResult:
@@ -27,6 +36,8 @@ def get_or_create_event(name, course='Y'):
         ev = Event(name=name, course=course)
         db.session.add(ev)
         db.session.flush()
+        data_version.bump(data_version.EVENTS)
+        registry().clear()
     return ev
 
 
@@ -47,6 +58,127 @@ def link_team_season_to_user(team_id, season_year, user_id):
                 season_year=season_year,
             )
         )
+        access.invalidate(user_id)
+
+
+def _batches(rows, size=UPSERT_BATCH):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def upsert_swimmers(team_id, gender, roster):
+    """Upsert SwimCloud swimmers on (team_id, swimcloud_id). roster = {swimcloud_id: name}.
+
+    A swimmer who transferred gets a new row on this team; their rows (and
+    times) on other teams are left alone.
+
+    Swimmers stored before swimcloud_id existed are adopted by (team, name)
+    so a re-import does not duplicate them.
+
+    Returns {swimcloud_id: swimmer.id}.
+    """
+    legacy = {
+        name: sid for sid, name in db.session.execute(
+            select(Swimmer.id, Swimmer.name).where(
+                Swimmer.team_id == team_id,
+                Swimmer.swimcloud_id.is_(None),
+            )
+        )
+    }
+    adopted = [
+        {'id': legacy.pop(name), 'swimcloud_id': sc_id}
+        for sc_id, name in roster.items() if name in legacy
+    ]
+    if adopted:
+        db.session.execute(update(Swimmer), adopted)
+
+    ids = {}
+    rows = [
+        {'swimcloud_id': sc_id, 'name': name, 'gender': gender, 'team_id': team_id}
+        for sc_id, name in roster.items()
+    ]
+    for batch in _batches(rows):
+        stmt = dialect_insert(Swimmer.__table__).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['team_id', 'swimcloud_id'],
+            set_={'name': stmt.excluded.name, 'gender': stmt.excluded.gender},
+        ).returning(Swimmer.__table__.c.id, Swimmer.__table__.c.swimcloud_id)
+        ids.update((sc_id, sid) for sid, sc_id in db.session.execute(stmt))
+    return ids
+
+
+def upsert_times(rows):
+    """Upsert best times on (swimmer_id, event_id, season_year), keeping the faster.
+
+    rows = [{'swimmer_id', 'event_id', 'season_year', 'time_cs', ...}]; every
+    row must carry the same keys. Duplicate keys within rows collapse to the
+    fastest first, since one statement cannot touch the same row twice.
+
+    Returns the number of rows inserted or improved.
+    """
+    best = {}
+    for row in rows:
+        key = (row['swimmer_id'], row['event_id'], row['season_year'])
+        if key not in best or row['time_cs'] < best[key]['time_cs']:
+            best[key] = row
+
+    table = Time.__table__
+    changed = 0
+    for batch in _batches(list(best.values())):
+        stmt = dialect_insert(table).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['swimmer_id', 'event_id', 'season_year'],
+            set_={col: stmt.excluded[col] for col in batch[0]
+                  if col not in ('swimmer_id', 'event_id', 'season_year')},
+            where=table.c.time_cs > stmt.excluded.time_cs,
+        )
+        changed += db.session.execute(stmt).rowcount
+    return changed
+
+
+def unlink_team_season(team_id, season_year, user_id):
+    """Remove a user's access to a team-season; delete its data if no one else has it.
+
+    Returns the "Team (season)" label for flash messages. Caller commits.
+    """
+    team = db.session.get(Team, team_id)
+    label = f"{team.name} ({season_year})"
+    db.session.execute(
+        user_team_seasons.delete().where(
+            (user_team_seasons.c.user_id == user_id) &
+            (user_team_seasons.c.team_id == team_id) &
+            (user_team_seasons.c.season_year == season_year)
+        )
+    )
+    access.invalidate(user_id)
+    db.session.flush()
+    other = db.session.execute(
+        user_team_seasons.select().where(
+            (user_team_seasons.c.team_id == team_id) &
+            (user_team_seasons.c.season_year == season_year)
+        )
+    ).first()
+    if other:
+        return label
+
+    drop_team_season(team_id, season_year)
+    data_version.bump(data_version.ts_scope(team_id, season_year))
+    swimmer_ids = [s.id for s in Swimmer.query.filter_by(team_id=team_id).all()]
+    if swimmer_ids:
+        Time.query.filter(
+            Time.swimmer_id.in_(swimmer_ids),
+            Time.season_year == season_year,
+        ).delete(synchronize_session=False)
+    remaining = (
+        db.session.query(Time.id)
+        .join(Time.swimmer)
+        .filter(Swimmer.team_id == team_id)
+        .first()
+    )
+    if not remaining:
+        Swimmer.query.filter_by(team_id=team_id).delete(synchronize_session=False)
+        db.session.delete(team)
+    return label
 
 
 def import_team(sc_team_id: int, sc_team_name: str, gender: str, year: int, user_id: int) -> ImportResult:
@@ -102,48 +234,29 @@ def import_team(sc_team_id: int, sc_team_name: str, gender: str, year: int, user
     db.session.add(team)
     db.session.flush()
 
-    swimmer_cache = {}
-    times_count = 0
+    swimmer_ids = upsert_swimmers(team.id, gender, roster_map)
 
+    time_rows = []
     for event_name, entries in events_data.items():
         evobj = get_or_create_event(event_name)
-        for entry in entries:
-            sc_id = entry['swimmer_id']
-            name  = entry['swimmer_name']
-            secs  = entry['time_secs']
-
-            if sc_id not in swimmer_cache:
-                swimmer_cache[sc_id] = (
-                    Swimmer.query.filter_by(name=name, team_id=team.id).first()
-                    or Swimmer(name=name, gender=gender, team_id=team.id)
-                )
-                db.session.add(swimmer_cache[sc_id])
-                db.session.flush()
-
-            swimmer = swimmer_cache[sc_id]
-            existing = Time.query.filter_by(
-                swimmer_id=swimmer.id,
-                event_id=evobj.id,
-                season_year=year,
-            ).first()
-
-            if existing:
-                if secs < float(existing.time_secs):
-                    existing.time_secs = secs
-                    times_count += 1
-                continue
-
-            db.session.add(Time(
-                swimmer_id=swimmer.id, event_id=evobj.id,
-                time_secs=secs, season_year=year,
-            ))
-            times_count += 1
+        time_rows.extend(
+            {
+                'swimmer_id': swimmer_ids[entry['swimmer_id']],
+                'event_id': evobj.id,
+                'season_year': year,
+                'time_cs': secs_to_cs(entry['time_secs']),
+            }
+            for entry in entries
+        )
+    times_count = upsert_times(time_rows)
+    refresh_team_season(team.id, year)
+    data_version.bump(data_version.ts_scope(team.id, year))
 
     link_team_season_to_user(team.id, year, user_id)
     db.session.commit()
     cache.clear()
     log.info(
         "Imported %d swimmers, %d times for %s (%s)",
-        len(swimmer_cache), times_count, sc_team_name, season,
+        len(swimmer_ids), times_count, sc_team_name, season,
     )
-    return ImportResult(sc_team_name, season, len(swimmer_cache), times_count, len(events_data), already_existed=False)
+    return ImportResult(sc_team_name, season, len(swimmer_ids), times_count, len(events_data), already_existed=False)
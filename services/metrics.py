@@ -0,0 +1,178 @@
+# Prometheus metrics: request latency per endpoint, SQL statements per request,
+# cache hit/miss per key family, SwimCloud call latency/errors and optimizer stages.
+# Under Gunicorn, PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) makes every
+# worker write to a shared directory and /metrics aggregates them.
+
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_FAST = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+_SLOW = (.05, .1, .25, .5, 1, 2.5, 5, 10, 15, 30)
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.',
+    ['method', 'endpoint'],
+)
+REQUESTS = Counter(
+    'http_requests_total', 'Requests by endpoint and status.',
+    ['method', 'endpoint', 'status'],
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    'http_request_sql_statements', 'SQL statements executed per request.',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+REQUEST_SQL_SECONDS = Histogram(
+    'http_request_sql_duration_seconds', 'Total SQL time per request.',
+    ['endpoint'], buckets=_FAST,
+)
+SQL_SECONDS = Histogram(
+    'sql_statement_duration_seconds', 'SQL statement latency by verb.',
+    ['verb'], buckets=_FAST,
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by key family ("snapshot", "acl", ...).',
+    ['family', 'result'],
+)
+SCRAPER_SECONDS = Histogram(
+    'scraper_request_duration_seconds', 'SwimCloud API call latency.',
+    ['call'], buckets=_SLOW,
+)
+SCRAPER_ERRORS = Counter(
+    'scraper_errors_total', 'Failed SwimCloud API calls by exception type.',
+    ['call', 'error'],
+)
+STAGE_SECONDS = Histogram(
+    'optimizer_stage_duration_seconds', 'Scoring stage latency (pool_build, squad_pick, ranking).',
+    ['stage'], buckets=_FAST,
+)
+MEDLEY_NODES = Histogram(
+    'medley_search_nodes', 'Branch-and-bound nodes expanded per medley assignment.',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+MEDLEY_CAP_BOUND = Counter(
+    'medley_cap_bound_total', 'Medley assignments whose candidate cap truncated a stroke pool.',
+)
+
+# (statements, seconds) for the request running in this context; None outside requests.
+_request_sql = ContextVar('request_sql', default=None)
+
+
+def cache_family(key):
+    """'snapshot:3:2025:M' -> 'snapshot'."""
+    return str(key).partition(':')[0]
+
+
+def record_cache(key, hit):
+    CACHE_REQUESTS.labels(cache_family(key), 'hit' if hit else 'miss').inc()
+
+
+def timed_stage(stage):
+    """Decorator observing the wrapped function's wall time as an optimizer stage."""
+    observe = STAGE_SECONDS.labels(stage).observe
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def timed_scrape(call, fn, *args, **kwargs):
+    """fn(*args, **kwargs), recording latency and any exception under call."""
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        SCRAPER_ERRORS.labels(call, type(e).__name__).inc()
+        raise
+    finally:
+        SCRAPER_SECONDS.labels(call).observe(time.perf_counter() - start)
+
+
+# ─── SQL ─────────────────────────────────────────────────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_start'].pop()
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    SQL_SECONDS.labels(verb).observe(elapsed)
+    totals = _request_sql.get()
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += elapsed
+
+
+def _handle_error(context):
+    """A failed statement never reaches after_cursor_execute: drop its start time here."""
+    conn = context.connection
+    if conn is not None and conn.info.get('metrics_start'):
+        conn.info['metrics_start'].pop()
+
+
+def _install_sql_listeners():
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+
+# ─── Flask wiring ────────────────────────────────────────────────────────────
+
+def render():
+    """(body, content type) for the current process, or every worker in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_app(app):
+    """Time every request and serve GET /metrics."""
+    from flask import Response, g, request
+
+    _install_sql_listeners()
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql = _request_sql.set([0, 0.0])
+
+    @app.after_request
+    def _observe(response):
+        start = g.pop('metrics_start', None)
+        token = g.pop('metrics_sql', None)
+        if start is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.labels(request.method, endpoint).observe(time.perf_counter() - start)
+        REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+        statements, seconds = _request_sql.get()
+        REQUEST_SQL_STATEMENTS.labels(endpoint).observe(statements)
+        REQUEST_SQL_SECONDS.labels(endpoint).observe(seconds)
+        _request_sql.reset(token)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape target."""
+        body, content_type = render()
+        return Response(body, content_type=content_type)
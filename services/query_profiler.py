@@ -0,0 +1,188 @@
+# SQL profiler for development and tests: every statement with its duration and the
+# project frames that issued it. Flags repeated statement shapes (N+1 loops) and
+# slow statements. QUERY_PROFILER=1 profiles each request; tests/conftest.py budgets tests.
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SKIP = (os.path.abspath(__file__), f"{os.sep}site-packages{os.sep}")
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+_request_profile = ContextVar('query_profile', default=None)
+_engine_profiles = []              # profiles collecting from every thread (tests)
+_lock = threading.Lock()
+
+
+def shape(statement):
+    """Statement with literals and IN-lists collapsed, so loop iterations compare equal."""
+    sql = _LITERALS.sub('?', _SPACE.sub(' ', statement).strip())
+    return _IN_LIST.sub('(?...)', sql)
+
+
+def call_site(depth=3):
+    """'file.py:line in func < caller...' for the innermost project frames, or '?'."""
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < depth:
+        path = frame.f_code.co_filename
+        if path.startswith(ROOT) and not any(s in path for s in _SKIP):
+            frames.append(f"{os.path.relpath(path, ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return ' < '.join(frames) or '?'
+
+
+@dataclass
+class Query:
+    statement: str
+    ms: float
+    site: str
+
+    @property
+    def shape(self):
+        return shape(self.statement)
+
+
+@dataclass(eq=False)
+class QueryProfile:
+    label: str = ''
+    queries: list = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(q.ms for q in self.queries)
+
+    @property
+    def statements(self):
+        return [q.statement for q in self.queries]
+
+    def repeated(self, threshold):
+        """[(shape, count, sites)] for shapes run at least threshold times: N+1 suspects."""
+        counts = Counter(q.shape for q in self.queries)
+        out = []
+        for sql, n in counts.most_common():
+            if n < threshold:
+                break
+            sites = Counter(q.site for q in self.queries if q.shape == sql)
+            out.append((sql, n, [s for s, _ in sites.most_common()]))
+        return out
+
+    def slow(self, threshold_ms):
+        return [q for q in self.queries if q.ms >= threshold_ms]
+
+    def report(self, repeat_threshold=5, slow_ms=100.0):
+        lines = [f"{self.label or 'profile'}: {len(self)} statements, {self.total_ms:.1f} ms"]
+        for sql, n, sites in self.repeated(repeat_threshold):
+            lines.append(f"  N+1? {n}x {sql[:160]}")
+            lines.extend(f"        at {site}" for site in sites[:3])
+        for q in self.slow(slow_ms):
+            lines.append(f"  SLOW {q.ms:.1f} ms {q.shape[:160]}\n        at {q.site}")
+        lines.append("  statements:")
+        lines.extend(f"    {q.ms:7.2f} ms  {q.shape[:120]}  ({q.site})" for q in self.queries)
+        return '\n'.join(lines)
+
+
+# ─── Collection ──────────────────────────────────────────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_profile.get() is not None or _engine_profiles:
+        conn.info.setdefault('profile_start', []).append((time.perf_counter(), call_site()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get('profile_start')
+    if not stack:
+        return
+    start, site = stack.pop()
+    query = Query(statement, (time.perf_counter() - start) * 1000, site)
+    current = _request_profile.get()
+    if current is not None:
+        current.queries.append(query)
+    with _lock:
+        for profile in _engine_profiles:
+            if profile is not current:
+                profile.queries.append(query)
+
+
+def _handle_error(context):
+    """A failed statement never reaches after_cursor_execute: drop its entry here."""
+    conn = context.connection
+    if conn is not None and conn.info.get('profile_start'):
+        conn.info['profile_start'].pop()
+
+
+def install():
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+
+@contextmanager
+def profile(label=''):
+    """Collect every statement run inside the block, from any thread."""
+    install()
+    result = QueryProfile(label)
+    with _lock:
+        _engine_profiles.append(result)
+    try:
+        yield result
+    finally:
+        with _lock:
+            _engine_profiles.remove(result)
+
+
+# ─── Flask wiring ────────────────────────────────────────────────────────────
+
+def init_app(app):
+    """With QUERY_PROFILER on, profile each request and report N+1 shapes and slow queries."""
+    if not app.config.get('QUERY_PROFILER'):
+        return
+    from flask import g, request
+
+    install()
+    repeats = app.config.get('QUERY_REPEAT_THRESHOLD', 5)
+    slow_ms = app.config.get('SLOW_QUERY_MS', 100.0)
+    report_dir = app.config.get('QUERY_REPORT_DIR')
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+
+    @app.before_request
+    def _start_profile():
+        g.query_profile = _request_profile.set(QueryProfile(f"{request.method} {request.path}"))
+
+    @app.after_request
+    def _finish_profile(response):
+        token = g.pop('query_profile', None)
+        if token is None:
+            return response
+        result = _request_profile.get()
+        _request_profile.reset(token)
+        response.headers['X-Query-Count'] = str(len(result))
+        flagged = result.repeated(repeats) or result.slow(slow_ms)
+        if flagged:
+            log.warning("%s", result.report(repeats, slow_ms))
+        if report_dir:
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unmatched'}.txt"
+            with open(os.path.join(report_dir, name), 'a') as f:
+                f.write(result.report(repeats, slow_ms) + '\n\n')
+        return response
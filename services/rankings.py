@@ -0,0 +1,59 @@
+# Maintains event_ranking, the denormalized best-times table behind rankings and relay pools.
+# Import, seed and team-season removal call these before committing; reads never join Time.
+
+from sqlalchemy import delete, insert, select
+
+from extensions import db
+from models import Team, Swimmer, Time, EventRanking
+
+_COLUMNS = [
+    'time_id', 'team_id', 'season_year', 'gender', 'event_id',
+    'swimmer_id', 'time_cs', 'team_name', 'swimmer_name',
+]
+
+
+def _source():
+    return (
+        select(
+            Time.id, Swimmer.team_id, Time.season_year, Swimmer.gender, Time.event_id,
+            Time.swimmer_id, Time.time_cs, Team.name, Swimmer.name,
+        )
+        .join(Swimmer, Time.swimmer_id == Swimmer.id)
+        .join(Team, Swimmer.team_id == Team.id)
+    )
+
+
+def drop_team_season(team_id, season_year):
+    """Delete the ranking rows for one team-season."""
+    db.session.execute(
+        delete(EventRanking).where(
+            EventRanking.team_id == team_id,
+            EventRanking.season_year == season_year,
+        )
+    )
+
+
+def refresh_team_season(team_id, season_year):
+    """Rebuild the ranking rows for one team-season from Time."""
+    drop_team_season(team_id, season_year)
+    db.session.execute(
+        insert(EventRanking).from_select(
+            _COLUMNS,
+            _source().where(Swimmer.team_id == team_id, Time.season_year == season_year),
+        )
+    )
+
+
+def rebuild_all(conn):
+    """Repopulate the whole table on a raw connection (used by migrations)."""
+    conn.execute(delete(EventRanking))
+    conn.execute(insert(EventRanking).from_select(_COLUMNS, _source()))
+
+
+def refresh_teams(team_ids):
+    """Rebuild the ranking rows for every season of the given teams (bulk loads)."""
+    team_ids = list(team_ids)
+    db.session.execute(delete(EventRanking).where(EventRanking.team_id.in_(team_ids)))
+    db.session.execute(
+        insert(EventRanking).from_select(_COLUMNS, _source().where(Swimmer.team_id.in_(team_ids)))
+    )
@@ -1,10 +1,17 @@
 # Domain logic: NCAA scoring tables, relay pool building, and squad selection.
 
 import logging
+import time
 from collections import defaultdict
 
-from extensions import db, cache
-from models import Team, Swimmer, Time
+from sqlalchemy import func, select, tuple_
+
+from extensions import db
+from models import EventRanking
+from services import solver_stats
+from services.db_routing import read_only
+from services.metrics import timed_stage
+from services.tracing import traced
 
 log = logging.getLogger(__name__)
 
@@ -45,71 +52,24 @@ def parse_time_to_seconds(ts: str) -> float:
     return int(parts[0]) * 60 + float(parts[1])
 
 
-# ── Cached pool builders ────────────────────────────────────────
-# The full, unfiltered pool is cached per (team, season, gender).
+def secs_to_cs(secs) -> int:
+    """Seconds to the integer hundredths stored in Time.time_cs."""
+    return int(round(float(secs) * 100))
+
+
+# ── Relay pools ─────────────────────────────────────────────────
+# Pools are sliced from cached TeamSeasonSnapshots (services/snapshot.py).
 # Exclusions are applied in memory after retrieval so the cache
 # stays stable regardless of which times a coach toggles.
 
-def _query_free_pool(tid, yr, dist, gender):
-    """Query DB for full free-relay pool (uncached helper)."""
-    cache_key = f"freepool:{tid}:{yr}:{dist}:{gender}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        log.debug("cache HIT  %s", cache_key)
-        return cached
-
-    log.debug("cache MISS %s — querying DB", cache_key)
-    rows = (
-        db.session.query(Time, Swimmer.id, Swimmer.name)
-        .join(Time.swimmer)
-        .filter(
-            Swimmer.team_id == tid,
-            Swimmer.gender == gender,
-            Time.season_year == yr,
-            Time.event.has(name=f"{dist} Free", course='Y'),
-        )
-        .order_by(Time.time_secs)
-        .all()
-    )
-    pool = [
-        {'time_id': tr.id, 'swimmer_id': sid, 'name': nm,
-         'time': float(tr.time_secs), 'stroke': 'Free'}
-        for tr, sid, nm in rows
-    ]
-    cache.set(cache_key, pool)
-    return pool
-
-
-def _query_medley_pools(tid, yr, gender):
-    """Query DB for full medley stroke pools (uncached helper)."""
-    cache_key = f"medley:{tid}:{yr}:{gender}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        log.debug("cache HIT  %s", cache_key)
-        return cached
-
-    log.debug("cache MISS %s — querying DB", cache_key)
-    stroke_pools = {}
-    for stroke in MEDLEY_STROKES:
-        rows = (
-            db.session.query(Time, Swimmer.id, Swimmer.name)
-            .join(Time.swimmer)
-            .filter(
-                Swimmer.team_id == tid,
-                Swimmer.gender == gender,
-                Time.season_year == yr,
-                Time.event.has(name=f"100 {stroke}", course='Y'),
-            )
-            .order_by(Time.time_secs)
-            .all()
-        )
-        stroke_pools[stroke] = [
-            {'swimmer_id': sid, 'name': nm,
-             'time': float(tr.time_secs), 'time_id': tr.id}
-            for tr, sid, nm in rows
-        ]
-    cache.set(cache_key, stroke_pools)
-    return stroke_pools
+def _free_pool(snap, dist):
+    """Free-relay pool: the snapshot's {dist} Free entries, tagged as Free legs."""
+    return [{**e, 'stroke': 'Free'} for e in snap.pool(f"{dist} Free")]
+
+
+def _medley_pools(snap):
+    """Medley stroke pools: the snapshot's 100-yard entries per stroke."""
+    return {stroke: snap.pool(f"100 {stroke}") for stroke in MEDLEY_STROKES}
 
 
 def _filter_excluded(pool, excluded):
@@ -123,21 +83,20 @@ def _filter_medley_excluded(stroke_pools, excluded):
             for stroke, entries in stroke_pools.items()}
 
 
-def build_all_pools(pairs, selected, relay_key, excluded, gender):
+@timed_stage('pool_build')
+@traced('scoring.build_all_pools')
+def build_all_pools(snapshots, relay_key, excluded):
+    """{'tid:yr': pool} for one relay from {'tid:yr': snapshot}."""
     pools = {}
-    for tid, _tname, yr in pairs:
-        key = f"{tid}:{yr}"
-        if key not in selected:
-            continue
+    for key, snap in snapshots.items():
         if relay_key == 'relay_medley':
-            raw = _query_medley_pools(tid, yr, gender)
-            pools[key] = _filter_medley_excluded(raw, excluded)
+            pools[key] = _filter_medley_excluded(_medley_pools(snap), excluded)
         else:
-            raw = _query_free_pool(tid, yr, RELAYS[relay_key], gender)
-            pools[key] = _filter_excluded(raw, excluded)
+            pools[key] = _filter_excluded(_free_pool(snap, RELAYS[relay_key]), excluded)
     return pools
 
 
+@traced('scoring.best_medley_assignment')
 def _best_medley_assignment(stroke_pools, used_ids=None):
     """Branch-and-bound best 4 (one per stroke, no swimmer repeated).
 
@@ -145,21 +104,31 @@ def _best_medley_assignment(stroke_pools, used_ids=None):
     Candidates per stroke are sorted ascending, capped at top 10, and
     pruned when partial_sum + optimistic remaining bound >= best known.
     Because candidates are sorted, once a stroke candidate triggers the
-    bound we *break* (all later candidates are slower).
+    bound we *break* (all later candidates are slower). Search statistics
+    go to services.solver_stats.
 
     Returns (total_secs, legs) or None if any stroke has no candidates.
     """
+    start = time.perf_counter()
     if used_ids is None:
         used_ids = set()
 
     ordered = MEDLEY_STROKES          # ['Back', 'Breast', 'Fly', 'Free']
+    cap = solver_stats.CANDIDATE_CAP
     filtered = {}
+    pool_sizes = {}
     for stroke in ordered:
         candidates = [e for e in stroke_pools.get(stroke, [])
                       if e['swimmer_id'] not in used_ids]
-        if not candidates:
-            return None
-        filtered[stroke] = sorted(candidates[:10], key=lambda x: x['time'])
+        pool_sizes[stroke] = len(candidates)
+        filtered[stroke] = sorted(candidates[:cap], key=lambda x: x['time'])
+    stats = solver_stats.MedleyCall(
+        pool_sizes, tuple(s for s in ordered if pool_sizes[s] > cap),
+    )
+    if not all(pool_sizes.values()):
+        stats.ms = (time.perf_counter() - start) * 1000
+        solver_stats.record(stats)
+        return None
 
     # Precompute optimistic suffix bound: sum of fastest available per remaining stroke
     min_times = [filtered[s][0]['time'] for s in ordered]
@@ -169,9 +138,12 @@ def _best_medley_assignment(stroke_pools, used_ids=None):
 
     best_total = [float('inf')]
     best_legs  = [None]
+    counts = [0, 0, 0]                # nodes, prunes, leaves
 
     def _search(depth, used, partial_sum, legs):
+        counts[0] += 1
         if depth == 4:
+            counts[2] += 1
             if partial_sum < best_total[0]:
                 best_total[0] = partial_sum
                 best_legs[0]  = legs[:]
@@ -185,6 +157,7 @@ def _best_medley_assignment(stroke_pools, used_ids=None):
             new_sum = partial_sum + cand['time']
             # Prune: sorted candidates mean all remaining are ≥ this one
             if new_sum + suffix_min[depth + 1] >= best_total[0]:
+                counts[1] += 1
                 break
 
             used.add(cand['swimmer_id'])
@@ -195,11 +168,20 @@ def _best_medley_assignment(stroke_pools, used_ids=None):
 
     _search(0, set(), 0.0, [])
 
+    stats.nodes, stats.prunes, stats.leaves = counts
+    stats.bound = suffix_min[0]
+    if best_legs[0] is not None:
+        stats.best = best_total[0]
+    stats.ms = (time.perf_counter() - start) * 1000
+    solver_stats.record(stats)
+
     if best_legs[0] is None:
         return None
     return (best_total[0], best_legs[0])
 
 
+@timed_stage('squad_pick')
+@traced('scoring.pick_greedy_squads')
 def pick_greedy_squads(pool, relay_key, top_n):
     """Take fastest 4, remove, repeat for up to top_n squads."""
     if relay_key == 'relay_medley':
@@ -224,6 +206,8 @@ def pick_greedy_squads(pool, relay_key, top_n):
     return squads
 
 
+@timed_stage('squad_pick')
+@traced('scoring.pick_scored_combos')
 def pick_scored_combos(pool, relay_key, max_per_team=2):
     """Up to max_per_team relays per team. For medley, brute-force each successive relay."""
     combos = []
@@ -249,6 +233,8 @@ def pick_scored_combos(pool, relay_key, max_per_team=2):
     return combos
 
 
+@timed_stage('ranking')
+@traced('scoring.rank_scored_combos')
 def rank_scored_combos(all_combos):
     """NCAA scored relay ranking.
 
@@ -332,50 +318,108 @@ def squads_to_display_rows(squads, score_table=None):
     return rows
 
 
-def query_individual_event(team_ids, seasons, excluded, ev_id, gender, top_n):
-    """Query and rank swimmers for one individual event. Returns display row dicts."""
-    rows = (
-        db.session.query(
-            Time, Swimmer.name.label('swimmer_name'),
-            Team.name.label('team_name'),
-            Time.season_year.label('season'),
+def ranking_query(team_seasons, excluded, event_ids, gender, top_n=None):
+    """Top-N distinct swimmers per event, deduped and ranked in SQL.
+
+    team_seasons = [(team_id, season_year)]; only those exact pairs are ranked.
+    The inner ROW_NUMBER keeps each swimmer's fastest swim per (event, season);
+    the outer one numbers the survivors per event as `place`. Works for a
+    single event or a batch; top_n=None returns every swimmer.
+    """
+    r = EventRanking
+    team_ids = {tid for tid, _ in team_seasons}
+    seasons = {yr for _, yr in team_seasons}
+    swim_rank = func.row_number().over(
+        partition_by=(r.event_id, r.swimmer_id, r.season_year),
+        order_by=(r.time_cs, r.time_id),
+    )
+    swims = (
+        select(
+            r.event_id, r.time_id, r.swimmer_id, r.time_cs,
+            r.swimmer_name, r.team_name, r.season_year.label('season'),
+            swim_rank.label('swim_rank'),
+        )
+        .where(
+            r.team_id.in_(team_ids), r.gender == gender,
+            r.event_id.in_(event_ids),
+            r.season_year.in_(seasons), ~r.time_id.in_(excluded),
+            tuple_(r.team_id, r.season_year).in_(list(team_seasons)),
         )
-        .join(Time.swimmer).join(Swimmer.team)
-        .filter(
-            Team.id.in_(team_ids), Swimmer.gender == gender,
-            Time.event_id == ev_id,
-            Time.season_year.in_(seasons), ~Time.id.in_(excluded),
+        .subquery()
+    )
+    place = func.row_number().over(
+        partition_by=swims.c.event_id,
+        order_by=(swims.c.time_cs, swims.c.time_id),
+    )
+    best = (
+        select(
+            swims.c.event_id, swims.c.time_id, swims.c.swimmer_id, swims.c.time_cs,
+            swims.c.swimmer_name, swims.c.team_name, swims.c.season,
+            place.label('place'),
         )
-        .order_by(Time.time_secs)
-        .limit(top_n * 50)
-        .all()
+        .where(swims.c.swim_rank == 1)
+        .subquery()
+    )
+    query = select(best).order_by(best.c.event_id, best.c.place)
+    if top_n is not None:
+        query = query.where(best.c.place <= top_n)
+    return query
+
+
+def _individual_row(place, entry, team, season):
+    secs = entry['time']
+    return {
+        'time_id':        entry['time_id'],
+        'combo_rank':     place,
+        'stroke':         '',
+        'swimmer_id':     entry['swimmer_id'],
+        'name':           entry['name'],
+        'team':           team,
+        'season':         season,
+        'time':           secs,
+        'time_fmt':       format_time(secs),
+        'combo_time':     secs,
+        'combo_time_fmt': format_time(secs),
+        'points':         score_for(INDIV_SCORE, place),
+    }
+
+
+@timed_stage('ranking')
+@traced('scoring.rank_individual_event')
+def rank_individual_event(snapshots, ev_name, excluded, top_n=None):
+    """Rank one event across cached snapshots. Returns display row dicts.
+
+    Snapshots already hold one best time per swimmer, so this is a merge of
+    sorted arrays; top_n=None ranks everyone.
+    """
+    entries = sorted(
+        ((e, snap) for snap in snapshots.values() for e in snap.pool(ev_name)
+         if e['time_id'] not in excluded),
+        key=lambda es: (es[0]['time'], es[0]['time_id']),
+    )
+    return [
+        _individual_row(place, e, snap.team_name, snap.season_year)
+        for place, (e, snap) in enumerate(entries[:top_n], start=1)
+    ]
+
+
+@read_only()
+def query_ranked_events(team_seasons, excluded, event_ids, gender, top_n=None):
+    """Rank several events in one query. Returns {event_id: display row dicts}."""
+    ranked = {ev_id: [] for ev_id in event_ids}
+    rows = db.session.execute(
+        ranking_query(team_seasons, excluded, event_ids, gender, top_n)
     )
-    seen, distinct = set(), []
     for row in rows:
-        key = (row.swimmer_name, row.team_name, row.season)
-        if key not in seen:
-            seen.add(key)
-            distinct.append(row)
-            if len(distinct) >= top_n:
-                break
-    swimmers = []
-    for idx, row in enumerate(distinct, start=1):
-        secs = float(row.Time.time_secs)
-        swimmers.append({
-            'time_id':        row.Time.id,
-            'combo_rank':     idx,
-            'stroke':         '',
-            'swimmer_id':     row.Time.swimmer_id,
-            'name':           row.swimmer_name,
-            'team':           row.team_name,
-            'season':         row.season,
-            'time':           secs,
-            'time_fmt':       format_time(secs),
-            'combo_time':     secs,
-            'combo_time_fmt': format_time(secs),
-            'points':         score_for(INDIV_SCORE, idx),
-        })
-    return swimmers
+        entry = {'time_id': row.time_id, 'swimmer_id': row.swimmer_id,
+                 'name': row.swimmer_name, 'time': row.time_cs / 100}
+        ranked[row.event_id].append(_individual_row(row.place, entry, row.team_name, row.season))
+    return ranked
+
+
+def query_individual_event(team_seasons, excluded, ev_id, gender, top_n):
+    """Query and rank swimmers for one individual event. Returns display row dicts."""
+    return query_ranked_events(team_seasons, excluded, [ev_id], gender, top_n)[ev_id]
 
 
 def build_relay_view(pools, ev, scoring_mode, max_rpt, relay_sort, choices_map, top_n, page, page_size):
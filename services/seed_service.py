@@ -3,9 +3,16 @@
 import datetime
 import random
 
-from extensions import db, cache
-from models import Team, Swimmer, Time
-from services.import_service import get_or_create_event, link_team_season_to_user
+from sqlalchemy import select
+
+from extensions import db, cache, dialect_insert
+from models import Team, Swimmer
+from services.scoring import secs_to_cs
+from services.rankings import refresh_team_season
+from services import data_version
+from services.import_service import (
+    get_or_create_event, link_team_season_to_user, upsert_times,
+)
 
 _MALE_FIRST = [
     'James', 'Michael', 'Ryan', 'Andrew', 'David', 'Tyler', 'Matt', 'Nick',
@@ -48,6 +55,7 @@ def seed_teams(user_id: int) -> tuple:
         (swimmers_created, times_created, teams_count)
     """
     swimmers_created = times_created = 0
+    events = {name: get_or_create_event(name).id for name in _BASE_TIMES}
 
     for team_name, year in _TEAMS:
         team = Team.query.filter_by(name=team_name).first() or Team(name=team_name)
@@ -55,6 +63,10 @@ def seed_teams(user_id: int) -> tuple:
         db.session.flush()
         link_team_season_to_user(team.id, year, user_id)
 
+        existing = dict(db.session.execute(
+            select(Swimmer.name, Swimmer.id).where(Swimmer.team_id == team.id)
+        ).all())
+        roster = []                   # (name, gender) in generation order
         for gender in ('M', 'F'):
             firsts = _MALE_FIRST if gender == 'M' else _FEMALE_FIRST
             used_names: set = set()
@@ -64,28 +76,37 @@ def seed_teams(user_id: int) -> tuple:
                     if name not in used_names:
                         used_names.add(name)
                         break
-                swimmer = (
-                    Swimmer.query.filter_by(name=name, team_id=team.id).first()
-                    or Swimmer(name=name, gender=gender, team_id=team.id)
-                )
-                db.session.add(swimmer)
-                db.session.flush()
-                swimmers_created += 1
+                roster.append((name, gender))
+        swimmers_created += len(roster)
+
+        new = [
+            {'name': name, 'gender': gender, 'team_id': team.id}
+            for name, gender in roster if name not in existing
+        ]
+        if new:
+            table = Swimmer.__table__
+            existing.update(db.session.execute(
+                dialect_insert(table).values(new).returning(table.c.name, table.c.id)
+            ).all())
 
-                for ev_name in random.sample(list(_BASE_TIMES), random.randint(3, 8)):
-                    lo, hi = _BASE_TIMES[ev_name]
-                    if gender == 'F':
-                        lo, hi = lo * 1.07, hi * 1.07
-                    evobj = get_or_create_event(ev_name)
-                    db.session.add(Time(
-                        swimmer_id=swimmer.id,
-                        event_id=evobj.id,
-                        time_secs=round(random.uniform(lo, hi), 2),
-                        meet=random.choice(_MEETS),
-                        date=datetime.date(year, random.randint(10, 12), random.randint(1, 28)),
-                        season_year=year,
-                    ))
-                    times_created += 1
+        time_rows = []
+        for name, gender in roster:
+            for ev_name in random.sample(list(_BASE_TIMES), random.randint(3, 8)):
+                lo, hi = _BASE_TIMES[ev_name]
+                if gender == 'F':
+                    lo, hi = lo * 1.07, hi * 1.07
+                time_rows.append({
+                    'swimmer_id': existing[name],
+                    'event_id': events[ev_name],
+                    'time_cs': secs_to_cs(random.uniform(lo, hi)),
+                    'meet': random.choice(_MEETS),
+                    'date': datetime.date(year, random.randint(10, 12), random.randint(1, 28)),
+                    'season_year': year,
+                })
+        times_created += len(time_rows)
+        upsert_times(time_rows)
+        refresh_team_season(team.id, year)
+        data_version.bump(data_version.ts_scope(team.id, year))
 
     db.session.commit()
     cache.clear()
@@ -0,0 +1,75 @@
+# One query per (team, season, gender): every SCY best time, split into per-event
+# arrays sorted by time. Rankings, relay pools and exports all read from it.
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+
+from extensions import db, cache
+from models import EventRanking
+from services.db_routing import read_only
+from services.event_registry import registry
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class TeamSeasonSnapshot:
+    team_id: int
+    season_year: int
+    gender: str
+    team_name: str = None
+    # event name -> [{'time_id', 'swimmer_id', 'name', 'time'}], fastest first
+    events: dict = field(default_factory=dict)
+
+    def pool(self, event_name):
+        return self.events.get(event_name, [])
+
+
+def snapshot_query(tid, yr, gender, event_ids):
+    """One range of ix_ranking_team_season covering every requested event."""
+    r = EventRanking
+    return (
+        select(r.event_id, r.time_id, r.swimmer_id, r.swimmer_name, r.team_name, r.time_cs)
+        .where(
+            r.team_id == tid, r.season_year == yr, r.gender == gender,
+            r.event_id.in_(event_ids),
+        )
+        .order_by(r.event_id, r.time_cs)
+    )
+
+
+@read_only()
+def load_snapshot(tid, yr, gender):
+    """Cached TeamSeasonSnapshot for one team-season and gender."""
+    cache_key = f"snapshot:{tid}:{yr}:{gender}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        log.debug("cache HIT  %s", cache_key)
+        return cached
+
+    log.debug("cache MISS %s — querying DB", cache_key)
+    events = registry()
+    snap = TeamSeasonSnapshot(tid, yr, gender)
+    pools = defaultdict(list)
+    for row in db.session.execute(snapshot_query(tid, yr, gender, list(events.ids().values()))):
+        snap.team_name = row.team_name
+        pools[events.name_for(row.event_id)].append({
+            'time_id': row.time_id, 'swimmer_id': row.swimmer_id,
+            'name': row.swimmer_name, 'time': row.time_cs / 100,
+        })
+    snap.events = dict(pools)
+    cache.set(cache_key, snap)
+    return snap
+
+
+def load_snapshots(pairs, selected, gender):
+    """{'tid:yr': snapshot} for the selected entries of (tid, tname, yr) pairs."""
+    snaps = {}
+    for tid, _tname, yr in pairs:
+        key = f"{tid}:{yr}"
+        if key in selected:
+            snaps[key] = load_snapshot(tid, yr, gender)
+    return snaps
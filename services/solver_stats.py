@@ -0,0 +1,128 @@
+# Search-tree statistics for the medley branch-and-bound (_best_medley_assignment).
+# Every call records nodes, prunes, candidate-cap truncation, bound tightness and wall
+# time into a per-process aggregate (GET /api/debug/solver); slow calls are logged.
+
+import logging
+import threading
+from collections import Counter
+from dataclasses import asdict, dataclass
+
+from services.metrics import MEDLEY_CAP_BOUND, MEDLEY_NODES
+
+log = logging.getLogger(__name__)
+
+CANDIDATE_CAP = 10            # candidates kept per stroke
+SLOWEST_KEPT = 10
+
+slow_ms = 50.0                # set from MEDLEY_SLOW_MS by init_app
+
+
+@dataclass
+class MedleyCall:
+    """One _best_medley_assignment call.
+
+    bound is the root lower bound (fastest available swimmer per stroke,
+    ignoring conflicts); tightness = bound / best, 1.0 when no swimmer is
+    fastest in two strokes. capped lists strokes whose pool exceeded
+    CANDIDATE_CAP, where slower candidates were never considered.
+    """
+    pool_sizes: dict
+    capped: tuple
+    nodes: int = 0
+    prunes: int = 0
+    leaves: int = 0
+    bound: float = None
+    best: float = None
+    ms: float = 0.0
+
+    @property
+    def tightness(self):
+        return self.bound / self.best if self.best else None
+
+
+class MedleyStats:
+    """Thread-safe running totals over MedleyCall records."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.infeasible = self.slow_calls = 0
+            self.nodes = self.prunes = self.max_nodes = 0
+            self.cap_bound_calls = 0
+            self.capped_strokes = Counter()
+            self.tightness_sum, self.tightness_n, self.min_tightness = 0.0, 0, None
+            self.total_ms = self.max_ms = 0.0
+            self.slowest = []
+
+    def record(self, call):
+        tightness = call.tightness
+        with self._lock:
+            self.calls += 1
+            self.nodes += call.nodes
+            self.prunes += call.prunes
+            self.max_nodes = max(self.max_nodes, call.nodes)
+            self.total_ms += call.ms
+            self.max_ms = max(self.max_ms, call.ms)
+            if call.best is None:
+                self.infeasible += 1
+            if call.capped:
+                self.cap_bound_calls += 1
+                self.capped_strokes.update(call.capped)
+            if tightness is not None:
+                self.tightness_sum += tightness
+                self.tightness_n += 1
+                self.min_tightness = min(self.min_tightness or tightness, tightness)
+            if call.ms >= slow_ms:
+                self.slow_calls += 1
+            if len(self.slowest) < SLOWEST_KEPT or call.ms > self.slowest[-1].ms:
+                self.slowest = sorted(self.slowest + [call], key=lambda c: -c.ms)[:SLOWEST_KEPT]
+
+    def summary(self):
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                'calls': self.calls,
+                'infeasible': self.infeasible,
+                'nodes': {'total': self.nodes, 'mean': self.nodes / calls, 'max': self.max_nodes},
+                'prunes': {'total': self.prunes, 'mean': self.prunes / calls},
+                'cap': {
+                    'limit': CANDIDATE_CAP,
+                    'bound_calls': self.cap_bound_calls,
+                    'bound_rate': self.cap_bound_calls / calls,
+                    'by_stroke': dict(self.capped_strokes),
+                },
+                'tightness': {
+                    'mean': self.tightness_sum / self.tightness_n if self.tightness_n else None,
+                    'min': self.min_tightness,
+                },
+                'ms': {'total': self.total_ms, 'mean': self.total_ms / calls, 'max': self.max_ms},
+                'slow_ms': slow_ms,
+                'slow_calls': self.slow_calls,
+                'slowest': [{**asdict(c), 'tightness': c.tightness} for c in self.slowest],
+            }
+
+
+medley = MedleyStats()
+
+
+def record(call):
+    """Aggregate one call, export it to Prometheus and log it when slow."""
+    medley.record(call)
+    MEDLEY_NODES.observe(call.nodes)
+    if call.capped:
+        MEDLEY_CAP_BOUND.inc()
+    if call.ms >= slow_ms:
+        log.warning(
+            "slow medley assignment: %.1f ms, %d nodes, %d prunes, pools %s, capped %s, "
+            "tightness %s", call.ms, call.nodes, call.prunes, call.pool_sizes,
+            ','.join(call.capped) or '-',
+            f"{call.tightness:.3f}" if call.tightness is not None else '-',
+        )
+
+
+def init_app(app):
+    global slow_ms
+    slow_ms = app.config.get('MEDLEY_SLOW_MS', slow_ms)
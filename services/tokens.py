@@ -0,0 +1,97 @@
+# Personal API tokens for automation clients ("Authorization: Bearer ssl_...").
+# Only HMAC-SHA256(SECRET_KEY, token) is stored, so verifying costs one keyed hash,
+# and repeat calls are answered from a per-process LRU without touching the DB.
+# Rotating SECRET_KEY invalidates every token.
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import select
+
+from extensions import db
+from models import ApiToken, User
+from services.access import Principal
+
+SCOPES = ("read", "import")
+TOKEN_PREFIX = "ssl_"
+LRU_SIZE = 1024
+LRU_TTL = 60        # seconds; bounds how long another worker honours a revoked token
+
+_lru = OrderedDict()   # token hash -> (expires_at, (user_id, username, scopes))
+_lock = threading.Lock()
+
+
+def _hash(raw):
+    key = current_app.config["SECRET_KEY"].encode()
+    return hmac.new(key, raw.encode(), hashlib.sha256).hexdigest()
+
+
+def create_token(user_id, name, scopes=("read",)):
+    """New token for user_id; returns (ApiToken, raw secret). The secret is shown once. Caller commits."""
+    unknown = set(scopes) - set(SCOPES)
+    if unknown:
+        raise ValueError(f"Unknown scope(s): {', '.join(sorted(unknown))}")
+    raw = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    token = ApiToken(
+        user_id=user_id,
+        name=name,
+        prefix=raw[:len(TOKEN_PREFIX) + 6],
+        token_hash=_hash(raw),
+        scopes=",".join(s for s in SCOPES if s == "read" or s in scopes),
+        created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+    db.session.add(token)
+    return token, raw
+
+
+def user_tokens(user_id):
+    return db.session.execute(
+        select(ApiToken).where(ApiToken.user_id == user_id).order_by(ApiToken.created_at.desc())
+    ).scalars().all()
+
+
+def revoke_token(user_id, token_id):
+    """Delete one of user_id's tokens. Returns False if it isn't theirs. Caller commits."""
+    token = db.session.execute(
+        select(ApiToken).where(ApiToken.id == token_id, ApiToken.user_id == user_id)
+    ).scalar_one_or_none()
+    if token is None:
+        return False
+    with _lock:
+        _lru.pop(token.token_hash, None)
+    db.session.delete(token)
+    return True
+
+
+def verify(raw):
+    """Principal carrying the token's scopes, or None for an unknown token."""
+    if not raw.startswith(TOKEN_PREFIX):
+        return None
+    digest = _hash(raw)
+    now = time.monotonic()
+    with _lock:
+        hit = _lru.get(digest)
+        if hit is not None and hit[0] > now:
+            _lru.move_to_end(digest)
+            return Principal(*hit[1])
+
+    row = db.session.execute(
+        select(User.id, User.username, ApiToken.scopes)
+        .join(ApiToken, ApiToken.user_id == User.id)
+        .where(ApiToken.token_hash == digest)
+    ).first()
+    if row is None:
+        return None
+    entry = (row.id, row.username, frozenset(row.scopes.split(",")))
+    with _lock:
+        _lru[digest] = (now + LRU_TTL, entry)
+        _lru.move_to_end(digest)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+    return Principal(*entry)
@@ -0,0 +1,238 @@
+# Lightweight request tracing: nested spans in a contextvar, sampled per request,
+# exported as OTLP/JSON (one ExportTraceServiceRequest per line) to a file or the log.
+# With SERVER_TIMING on, every request is traced and gets a Server-Timing header.
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+SERVICE_NAME = 'swim-scoring'
+EXPORTERS = ('file', 'console')
+_STATEMENT_CHARS = 200
+
+_current = ContextVar('trace_span', default=None)
+_file_lock = threading.Lock()
+
+
+class Trace:
+    """One request's spans. Only sampled traces are exported."""
+
+    __slots__ = ('trace_id', 'sampled', 'spans')
+
+    def __init__(self, sampled):
+        self.trace_id = os.urandom(16).hex()
+        self.sampled = sampled
+        self.spans = []
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'start_ns', 'end_ns', 'attributes')
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        trace.spans.append(self)
+
+    def end(self):
+        self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def child(self, name, attributes=None):
+        return Span(self.trace, name, self.span_id, attributes)
+
+
+def current_span():
+    return _current.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Child span of the current one; a no-op outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        child.end()
+        _current.reset(token)
+
+
+def traced(name):
+    """Decorator wrapping each call in span(name)."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(name, sampled, **attributes):
+    """(root span, context token). Pass the token to finish_trace."""
+    root = Span(Trace(sampled), name, attributes=attributes)
+    return root, _current.set(root)
+
+
+def finish_trace(root, token):
+    root.end()
+    _current.reset(token)
+    return root.trace
+
+
+# ─── Output ──────────────────────────────────────────────────────────────────
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(trace):
+    """The trace as an OTLP/JSON ExportTraceServiceRequest dict."""
+    spans = [{
+        'traceId': trace.trace_id,
+        'spanId': s.span_id,
+        'parentSpanId': s.parent_id or '',
+        'name': s.name,
+        'kind': 2 if s.parent_id is None else 1,         # SERVER for the root, else INTERNAL
+        'startTimeUnixNano': str(s.start_ns),
+        'endTimeUnixNano': str(s.end_ns or s.start_ns),
+        'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in s.attributes.items()],
+    } for s in trace.spans]
+    return {'resourceSpans': [{
+        'resource': {'attributes': [
+            {'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}},
+        ]},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+    }]}
+
+
+def export(trace, exporter, path=None):
+    line = json.dumps(to_otlp(trace), separators=(',', ':'))
+    if exporter == 'console':
+        log.info("trace %s", line)
+        return
+    with _file_lock, open(path, 'a') as f:
+        f.write(line + '\n')
+
+
+def server_timing(trace):
+    """Server-Timing header value: total ms and count per span name, slowest first."""
+    totals = {}
+    for s in trace.spans:
+        ms, n = totals.get(s.name, (0.0, 0))
+        totals[s.name] = (ms + s.duration_ms, n + 1)
+    return ', '.join(
+        f'{name};dur={ms:.2f};desc="{n}x"'
+        for name, (ms, n) in sorted(totals.items(), key=lambda kv: -kv[1][0])
+    )
+
+
+# ─── SQL ─────────────────────────────────────────────────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is not None:
+        conn.info.setdefault('trace_spans', []).append(
+            parent.child('db', {'db.statement': statement[:_STATEMENT_CHARS]})
+        )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None and conn.info.get('trace_spans'):
+        conn.info['trace_spans'].pop().end()
+
+
+def _handle_error(context):
+    """A failed statement never reaches after_cursor_execute: end its span here."""
+    conn = context.connection
+    if conn is not None and conn.info.get('trace_spans'):
+        failed = conn.info['trace_spans'].pop()
+        failed.attributes['error.type'] = type(context.original_exception).__name__
+        failed.end()
+
+
+def _install_sql_listeners():
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+
+# ─── Flask wiring ────────────────────────────────────────────────────────────
+
+def init_app(app):
+    """Trace sampled requests (TRACE_SAMPLE_RATE), and all of them when SERVER_TIMING is on."""
+    from flask import before_render_template, g, request, template_rendered
+
+    exporter = app.config.get('TRACE_EXPORTER', 'file')
+    if exporter not in EXPORTERS:
+        raise ValueError(f"TRACE_EXPORTER must be one of: {', '.join(EXPORTERS)}")
+    _install_sql_listeners()
+
+    @app.before_request
+    def _start():
+        sampled = random.random() < app.config.get('TRACE_SAMPLE_RATE', 0.0)
+        if sampled or app.config.get('SERVER_TIMING'):
+            g.trace = start_trace('route', sampled, **{'http.method': request.method})
+
+    @app.after_request
+    def _finish(response):
+        started = g.pop('trace', None)
+        if started is None:
+            return response
+        root, token = started
+        root.name = f"route.{request.endpoint or 'unmatched'}"
+        root.attributes['http.status_code'] = response.status_code
+        trace = finish_trace(root, token)
+        if app.config.get('SERVER_TIMING'):
+            response.headers['Server-Timing'] = server_timing(trace)
+        if trace.sampled:
+            export(trace, exporter, app.config.get('TRACE_FILE'))
+        return response
+
+    def _render_started(sender, template, context, **extra):
+        parent = _current.get()
+        if parent is not None:
+            child = parent.child(f"render.{template.name}")
+            g.setdefault('trace_renders', []).append((child, _current.set(child)))
+
+    def _render_finished(sender, template, context, **extra):
+        renders = g.get('trace_renders')
+        if _current.get() is not None and renders:
+            child, token = renders.pop()
+            child.end()
+            _current.reset(token)
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
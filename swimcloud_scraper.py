@@ -4,6 +4,9 @@ import logging
 
 import requests
 
+from services.metrics import timed_scrape
+from services.tracing import span
+
 log = logging.getLogger(__name__)
 
 _HEADERS = {
@@ -38,13 +41,18 @@ INDIVIDUAL_EVENT_CODES = {
 }
 
 
-def _fetch_json(url, params=None, timeout=15):
-    """GET url, return JSON."""
+def _get_json(url, params, timeout):
     resp = requests.get(url, headers=_HEADERS, params=params, timeout=timeout)
     resp.raise_for_status()
     return resp.json()
 
 
+def _fetch_json(url, params=None, timeout=15, call="other"):
+    """GET url, return JSON. Latency and failures are recorded under call."""
+    with span(f"swimcloud.{call}"):
+        return timed_scrape(call, _get_json, url, params, timeout)
+
+
 def _year_to_season_id(year):
     """User types 2025 (season 2024-25). SwimCloud wants season_id = (year-1) - 1996."""
     return (year - 1) - 1996
@@ -57,7 +65,7 @@ def season_label(year):
 
 def search_teams(query):
     """Fuzzy search by team name. Returns list of {name, abbr, id}."""
-    data = _fetch_json(f"{_API_BASE}/api/search/?q={query}&types=team")
+    data = _fetch_json(f"{_API_BASE}/api/search/?q={query}&types=team", call="search")
     teams = []
     for item in data:
         team_url = item.get("url", "")
@@ -87,6 +95,7 @@ def _fetch_event_times(team_id, gender, season_id, event_code):
     data = _fetch_json(
         f"{_API_BASE}/api/splashes/top_times/",
         params=params,
+        call="top_times",
     )
     results = []
     for entry in data.get("results", []):
@@ -0,0 +1,62 @@
+# Query budgets for tests, backed by services.query_profiler.
+#
+#   @pytest.mark.query_budget(5)              # the whole test body runs <= 5 statements
+#   @pytest.mark.query_budget(repeats=3)      # ...and no statement shape runs 3+ times
+#
+#   def test_x(query_budget):
+#       with query_budget(4, "GET /api/teams"):   # just this block
+#           client.get("/api/teams")
+#
+# A test over budget fails with the profiler report (N+1 shapes, call sites, statements).
+
+from contextlib import contextmanager
+
+import pytest
+
+from services.query_profiler import profile
+
+pytest_plugins = ["pytester"]
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_queries=None, repeats=None): fail the test if its body runs more "
+        "than max_queries SQL statements, or any statement shape `repeats` times or more",
+    )
+
+
+def _check(result, max_queries=None, repeats=None):
+    problems = []
+    if max_queries is not None and len(result) > max_queries:
+        problems.append(f"ran {len(result)} SQL statements (budget {max_queries})")
+    if repeats is not None and result.repeated(repeats):
+        problems.append(f"repeated a statement shape {repeats}+ times (N+1)")
+    if problems:
+        pytest.fail(
+            f"{result.label}: {'; '.join(problems)}\n{result.report(repeats or 5)}",
+            pytrace=False,
+        )
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        yield
+        return
+    with profile(item.nodeid) as result:
+        outcome = yield
+    if outcome.excinfo is None:
+        _check(result, *marker.args, **marker.kwargs)
+
+
+@pytest.fixture
+def query_budget():
+    """Context manager: profile the block and fail if it exceeds the budget."""
+    @contextmanager
+    def budget(max_queries=None, label="block", repeats=None):
+        with profile(label) as result:
+            yield result
+        _check(result, max_queries, repeats)
+    return budget